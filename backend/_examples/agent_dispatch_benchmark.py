@@ -0,0 +1,106 @@
+"""
+Agent dispatch benchmark: event-to-handler latency and idle CPU
+对比旧版 100 ms 轮询 (wait_for(recv(), 0.1)) 与当前的 async for 分发
+
+用法: uv run _examples/agent_dispatch_benchmark.py
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import contextlib
+import json
+import statistics
+import time
+
+from agent.abstract_agent import Agent
+
+EVENTS = 200
+IDLE_SECONDS = 3
+
+
+class FakeConnection:
+    """模拟 websockets 连接：recv() 与 async for 都从同一个队列读取"""
+    def __init__(self):
+        self.queue: asyncio.Queue[str | None] = asyncio.Queue()
+
+    async def recv(self):
+        message = await self.queue.get()
+        if message is None:
+            raise asyncio.CancelledError
+        return message
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.queue.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    async def send(self, message):
+        pass
+
+
+class PollingAgent(Agent):
+    """旧版实现：每 100 ms 超时一次的轮询接收"""
+    async def main_loop(self):
+        while True:
+            try:
+                message = await asyncio.wait_for(self.ws.recv(), timeout=0.1)
+                message = json.loads(message)
+            except (json.JSONDecodeError, asyncio.TimeoutError):
+                continue
+            event_data = message.get("data", {})
+            event_type = event_data.get("type", "")
+            if event_type != "loop" and event_type in self._event_handlers:
+                for handler in self._event_handlers[event_type]:
+                    if asyncio.iscoroutinefunction(handler):
+                        asyncio.create_task(handler(self, message.get("time", ""), event_data))
+                    else:
+                        handler(self, message.get("time", ""), event_data)
+
+
+async def bench(agent_cls: type[Agent]):
+    agent = agent_cls("localhost:8000", "benchmark")
+    agent.ws = FakeConnection()
+    latencies = []
+
+    @agent.on("user_input")
+    async def handle_user_input(_, timestamp, event_data):
+        latencies.append(time.perf_counter() - event_data["sent_at"])
+
+    main_task = asyncio.create_task(agent.main_loop())
+
+    # 空闲 CPU
+    cpu_start = time.process_time()
+    await asyncio.sleep(IDLE_SECONDS)
+    idle_cpu = (time.process_time() - cpu_start) / IDLE_SECONDS
+
+    # 事件到处理函数的延迟
+    for _ in range(EVENTS):
+        event = {"time": "", "data": {"type": "user_input", "content": "你好", "sent_at": time.perf_counter()}}
+        agent.ws.queue.put_nowait(json.dumps(event))
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.2)
+
+    main_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await main_task
+
+    latencies.sort()
+    return idle_cpu, statistics.mean(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def main():
+    print(f"{'':>10} {'idle cpu':>10} {'mean latency':>14} {'p99 latency':>13}")
+    for name, agent_cls in (("polling", PollingAgent), ("async for", Agent)):
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            idle_cpu, mean_latency, p99_latency = await bench(agent_cls)
+        print(f"{name:>10} {idle_cpu * 100:>9.3f}% {mean_latency * 1e6:>11.1f} us {p99_latency * 1e6:>10.1f} us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
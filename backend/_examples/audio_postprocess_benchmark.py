@@ -0,0 +1,106 @@
+"""
+Audio post-processing benchmark: peak memory and time per sentence
+对比旧版 get_tts_wav 的后处理（全量 np.abs + 多次 concatenate + wave/BytesIO 封装）
+与当前的 find_audio_end + TailSilenceNormalizer + PCMBuffer
+
+用法: uv run _examples/audio_postprocess_benchmark.py
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+from tts.audio_process import TailSilenceNormalizer, PCMBuffer
+
+SAMPLE_RATE = 32000
+TARGET_SILENCE_MS = 200
+SENTENCE_SECONDS = 4
+CHUNK_SECONDS = 0.25 # Genie 每次产出的音频块长度
+TAIL_SILENCE_SECONDS = 0.6
+SENTENCES = 200
+
+
+def make_chunks() -> list[bytes]:
+    """模拟一句话的输出：有声音频 + 尾部静音，按块切分"""
+    rng = np.random.default_rng(0)
+    voiced = rng.integers(-8000, 8000, int(SAMPLE_RATE * SENTENCE_SECONDS), dtype=np.int16)
+    silence = rng.integers(-5, 5, int(SAMPLE_RATE * TAIL_SILENCE_SECONDS), dtype=np.int16)
+    audio = np.concatenate([voiced, silence]).tobytes()
+    chunk_size = int(SAMPLE_RATE * CHUNK_SECONDS) * 2
+    return [audio[i:i + chunk_size] for i in range(0, len(audio), chunk_size)]
+
+
+def legacy_postprocess(chunks: list[bytes]) -> bytes:
+    """旧版 get_tts_wav：先拼接全部音频，再整体处理尾部静音"""
+    audio_data = np.concatenate([np.frombuffer(chunk, dtype=np.int16) for chunk in chunks])
+
+    target_silence_samples = int(SAMPLE_RATE * TARGET_SILENCE_MS / 1000)
+    non_silent_indices = np.where(np.abs(audio_data) > 10)[0]
+    if len(non_silent_indices) > 0:
+        audio_end = non_silent_indices[-1] + 1
+        current_silence = len(audio_data) - audio_end
+        if current_silence < target_silence_samples:
+            silence = np.zeros(target_silence_samples - current_silence, dtype=np.int16)
+            audio_data = np.concatenate([audio_data, silence])
+        else:
+            audio_data = audio_data[:audio_end + target_silence_samples]
+
+    wav_bytesio = io.BytesIO()
+    with wave.open(wav_bytesio, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(audio_data.tobytes())
+    return wav_bytesio.getvalue()
+
+
+def current_postprocess(chunks: list[bytes]) -> bytearray:
+    """当前 get_tts_wav：逐块处理，直接写入预分配的缓冲区"""
+    buffer = PCMBuffer(capacity=SAMPLE_RATE * 2 * 4, sample_rate=SAMPLE_RATE)
+    normalizer = TailSilenceNormalizer(SAMPLE_RATE, TARGET_SILENCE_MS)
+    for chunk in chunks:
+        for audio_chunk in normalizer.feed(np.frombuffer(chunk, dtype=np.int16)):
+            buffer.write(audio_chunk)
+    tail, silence_samples = normalizer.finish()
+    for audio_chunk in tail:
+        buffer.write(audio_chunk)
+    buffer.write_silence(silence_samples * 2)
+    return buffer.to_wav()
+
+
+def measure(postprocess, chunks: list[bytes]) -> tuple[int, float]:
+    """返回 (每句峰值内存, 每句耗时)"""
+    tracemalloc.start()
+    postprocess(chunks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(SENTENCES):
+        postprocess(chunks)
+    elapsed = (time.perf_counter() - start) / SENTENCES
+    return peak, elapsed
+
+
+def main():
+    chunks = make_chunks()
+    legacy_wav = legacy_postprocess(chunks)
+    current_wav = current_postprocess(chunks)
+    assert bytes(current_wav) == legacy_wav, "输出不一致"
+
+    audio_bytes = sum(len(chunk) for chunk in chunks)
+    print(f"sentence: {SENTENCE_SECONDS + TAIL_SILENCE_SECONDS:.1f} s, {len(chunks)} chunks, {audio_bytes / 1024:.0f} KiB PCM")
+    print(f"{'':>8} {'peak memory':>12} {'time':>10}")
+    for name, postprocess in (("legacy", legacy_postprocess), ("current", current_postprocess)):
+        peak, elapsed = measure(postprocess, chunks)
+        print(f"{name:>8} {peak / 1024:>8.0f} KiB {elapsed * 1e3:>7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Relay micro-benchmark: agent -> frontends event throughput vs. number of connected frontends
+
+用法: uv run _examples/relay_benchmark.py
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import base64
+import json
+import logging
+import struct
+import time
+
+import run_server
+from run_server import agent_manager, frontend_manager, handle_agent_message, relay_agent_event, relay_agent_audio, split_event_envelope
+
+logging.getLogger(run_server.__name__).setLevel(logging.WARNING)
+
+AGENT_NAME = "shumeiniang"
+FANOUT = 8 # 订阅目标智能体的前端数量
+EVENTS = 2000
+
+
+def wav_header(data_size: int, sample_rate: int = 24000) -> bytes:
+    """16 bit 单声道 PCM WAV 文件头（不导入 tts 包，避免加载 TTS 后端）"""
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + data_size, b'WAVE', b'fmt ', 16, 1, 1,
+                       sample_rate, sample_rate * 2, 2, 16, b'data', data_size)
+
+
+class FakeWebSocket:
+    """只计数、不做网络 I/O 的 WebSocket"""
+    def __init__(self, delay: float = 0):
+        self.sent = 0
+        self.sent_bytes = 0
+        self.delay = delay # 模拟网络状况差的观众
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent += 1
+        self.sent_bytes += len(message.encode("utf-8"))
+
+    async def send_bytes(self, message: bytes):
+        self.sent += 1
+        self.sent_bytes += len(message)
+
+
+async def drain(manager):
+    """等待所有发送队列清空"""
+    while any(sender._queue for sender in manager.senders.values()):
+        await asyncio.sleep(0)
+
+
+async def bench(num_other_frontends: int):
+    agent_ws = FakeWebSocket()
+    agent_id = await agent_manager.connect(agent_ws, {"agent_name": AGENT_NAME})
+
+    client_ids = []
+    for _ in range(FANOUT):
+        client_ids.append(await frontend_manager.connect(FakeWebSocket(), {"agent_name": AGENT_NAME}))
+    for i in range(num_other_frontends):
+        # 其他智能体的观众，路由时不应被扫描
+        client_ids.append(await frontend_manager.connect(FakeWebSocket(), {"agent_name": f"other_{i % 16}"}))
+
+    message = {"type": "event", "data": {"type": "bracket_tag", "content": "点头"}}
+    await drain(frontend_manager) # 先发完欢迎消息
+
+    start = time.perf_counter()
+    for _ in range(EVENTS):
+        await handle_agent_message(agent_id, message)
+        await asyncio.sleep(0) # 模拟逐条接收智能体消息
+    await drain(frontend_manager)
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(EVENTS):
+        [
+            client_id for client_id, user_info in frontend_manager.users.items()
+            if user_info.get("agent_name") == AGENT_NAME
+        ]
+    scan_elapsed = time.perf_counter() - start
+
+    for client_id in client_ids:
+        await frontend_manager.disconnect(client_id)
+    await agent_manager.disconnect(agent_id)
+
+    return EVENTS / elapsed, EVENTS / scan_elapsed
+
+
+async def bench_slow_viewer(delay: float = 0.05, events: int = 50):
+    """一个慢观众存在时，其余观众收到全部事件所需的时间"""
+    agent_id = await agent_manager.connect(FakeWebSocket(), {"agent_name": AGENT_NAME})
+    fast = [FakeWebSocket() for _ in range(FANOUT)]
+    client_ids = [await frontend_manager.connect(ws, {"agent_name": AGENT_NAME}) for ws in fast]
+    client_ids.append(await frontend_manager.connect(FakeWebSocket(delay), {"agent_name": AGENT_NAME}))
+
+    message = {"type": "event", "data": {"type": "bracket_tag", "content": "点头"}}
+
+    start = time.perf_counter()
+    for _ in range(events):
+        await handle_agent_message(agent_id, message)
+        await asyncio.sleep(0)
+    # 欢迎消息 + events 条事件
+    while any(ws.sent < events + 1 for ws in fast):
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+
+    for client_id in client_ids:
+        await frontend_manager.disconnect(client_id)
+    await agent_manager.disconnect(agent_id)
+    return elapsed
+
+
+async def bench_large_payload(num_viewers: int = 100, events: int = 50):
+    """大体积 say_aloud 事件：完整 JSON 解析/序列化 vs 只解析信封"""
+    agent_id = await agent_manager.connect(FakeWebSocket(), {"agent_name": AGENT_NAME})
+    client_ids = [await frontend_manager.connect(FakeWebSocket(), {"agent_name": AGENT_NAME}) for _ in range(num_viewers)]
+    await drain(frontend_manager)
+
+    media_data = base64.b64encode(os.urandom(300 * 1024)).decode("utf-8")
+    text = json.dumps({"type": "event", "data": {"type": "say_aloud", "content": "你好", "media_data": media_data, "format": "wav"}})
+
+    start = time.perf_counter()
+    for _ in range(events):
+        await handle_agent_message(agent_id, json.loads(text))
+        await drain(frontend_manager)
+    full_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(events):
+        await relay_agent_event(agent_id, split_event_envelope(text))
+        await drain(frontend_manager)
+    envelope_elapsed = time.perf_counter() - start
+
+    for client_id in client_ids:
+        await frontend_manager.disconnect(client_id)
+    await agent_manager.disconnect(agent_id)
+    return events / full_elapsed, events / envelope_elapsed
+
+
+async def bench_audio_codec(seconds: int = 10, chunk_ms: int = 100):
+    """流式语音（24 kHz 16 bit）发给二进制帧观众：未压缩 vs Opus 的每位观众带宽"""
+    import numpy as np
+    from protocol import pack_audio_frame
+
+    agent_id = await agent_manager.connect(FakeWebSocket(), {"agent_name": AGENT_NAME})
+    viewers = {codec: FakeWebSocket() for codec in ("", "opus")}
+    client_ids = [
+        await frontend_manager.connect(ws, {"agent_name": AGENT_NAME, "binary_audio": True, "audio_codec": codec})
+        for codec, ws in viewers.items()
+    ]
+    await drain(frontend_manager)
+    for ws in viewers.values():
+        ws.sent_bytes = 0
+
+    # 带谐波的浊音，比白噪声更接近语音
+    t = np.arange(24000 * seconds) / 24000
+    pcm = (3000 * np.sin(2 * np.pi * 180 * t) * (1 + np.sin(2 * np.pi * 3 * t)) + 800 * np.sin(2 * np.pi * 900 * t)).astype(np.int16).tobytes()
+    step = 24000 * 2 * chunk_ms // 1000
+    start = time.perf_counter()
+    for i in range(0, len(pcm), step):
+        chunk = pcm[i:i + step]
+        if i == 0:
+            chunk, format = wav_header(len(chunk)) + chunk, "wav"
+        else:
+            format = "pcm"
+        await relay_agent_audio(agent_id, pack_audio_frame({"type": "say_aloud", "content": "", "format": format}, chunk))
+    await drain(frontend_manager)
+    elapsed = time.perf_counter() - start
+
+    for client_id in client_ids:
+        await frontend_manager.disconnect(client_id)
+    await agent_manager.disconnect(agent_id)
+    return {codec or "pcm": ws.sent_bytes / seconds for codec, ws in viewers.items()}, elapsed / seconds
+
+
+async def main():
+    print(f"fanout = {FANOUT}, events = {EVENTS}")
+    print(f"{'frontends':>10} {'relay events/s':>16} {'linear scan lookups/s':>22}")
+    for n in (0, 100, 1000, 10000):
+        relay_rate, scan_rate = await bench(n)
+        print(f"{n + FANOUT:>10} {relay_rate:>16.0f} {scan_rate:>22.0f}")
+
+    elapsed = await bench_slow_viewer()
+    print(f"with one 50 ms/send viewer, other viewers received 50 events in {elapsed * 1000:.1f} ms")
+
+    full_rate, envelope_rate = await bench_large_payload()
+    print(f"400 KB say_aloud to 100 viewers: full json {full_rate:.0f} events/s, envelope only {envelope_rate:.0f} events/s")
+
+    rates, relay_time = await bench_audio_codec()
+    print(f"streamed speech per viewer: pcm {rates['pcm'] / 1024:.1f} KB/s, opus {rates['opus'] / 1024:.1f} KB/s "
+          f"({relay_time * 1000:.1f} ms relay time per second of audio)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
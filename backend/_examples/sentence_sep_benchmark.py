@@ -0,0 +1,83 @@
+"""
+SentenceSepNode benchmark: a 50 KB response fed in 1-character deltas
+对比旧版（每次对整个缓冲区重新 re.split / re.findall）与当前的增量扫描
+
+用法: uv run _examples/sentence_sep_benchmark.py
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import random
+import re
+import time
+
+from stream_node import SentenceSepNode, AccumulativeListNode
+from stream_node.absctract_stream_node import StreamNode
+
+SEPS = "'.:;?!。：；？！\n" # 与 BasicChattingAgent 相同
+RESPONSE_BYTES = 50 * 1024
+
+
+class LegacySentenceSepNode(StreamNode):
+    """旧版实现"""
+    def __init__(self, seps: str = ',.:;?!，。：；？！\n', keep_seps: bool = True):
+        super().__init__()
+        self.seps = seps
+        self.keep_seps = keep_seps
+        self.buffer = ""
+
+    async def process(self, data: str):
+        self.buffer += data
+        split = re.split(f'[{re.escape(self.seps)}]', self.buffer)
+
+        if self.keep_seps:
+            seps = re.findall(f'[{re.escape(self.seps)}]', self.buffer)
+            sentences = [sentence + sep for sentence, sep in zip(split[:-1], seps)]
+        else:
+            sentences = split[:-1]
+
+        self.buffer = split[-1]
+        return sentences
+
+
+def make_response(separated: bool) -> str:
+    """separated=False 时模拟没有分隔符的长输出（代码、列表等）"""
+    rng = random.Random(0)
+    alphabet = "树莓娘北京理工大学网络开拓者协会abcxyz0123 "
+    text = []
+    size = 0
+    while size < RESPONSE_BYTES:
+        piece = "".join(rng.choice(alphabet) for _ in range(rng.randint(5, 40)))
+        if separated:
+            piece += rng.choice(SEPS)
+        text.append(piece)
+        size += len(piece.encode("utf-8"))
+    return "".join(text)
+
+
+async def bench(node_cls: type[StreamNode], text: str) -> tuple[float, list[str]]:
+    node = node_cls(seps=SEPS)
+    acc = AccumulativeListNode()
+    node.connect_to(acc)
+
+    start = time.perf_counter()
+    for char in text:
+        await node.handle(char)
+    elapsed = time.perf_counter() - start
+    return elapsed, acc.buffer
+
+
+async def main():
+    print(f"{'':>20} {'legacy':>10} {'current':>10}")
+    for name, separated in (("with separators", True), ("no separators", False)):
+        text = make_response(separated)
+        legacy_elapsed, legacy_sentences = await bench(LegacySentenceSepNode, text)
+        current_elapsed, current_sentences = await bench(SentenceSepNode, text)
+        assert legacy_sentences == current_sentences, "输出不一致"
+        print(f"{name:>20} {legacy_elapsed * 1000:>7.1f} ms {current_elapsed * 1000:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,6 +5,7 @@ AI VTuber Agent (behavior controller)
 from typing import Literal, Union, Callable, Any
 
 import asyncio
+import base64
 import json
 import websockets
 
@@ -12,12 +13,15 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from protocol import pack_audio_frame
+from .handler_runner import HandlerRunner, ConcurrencyPolicy
+
 BotConfig = dict[Union[Literal["api_name"], str], str]
 TimeStampISO = str
 EventData = dict
 
 class Agent:
-    def __init__(self, server_url: str, agent_name: str):
+    def __init__(self, server_url: str, agent_name: str, binary_audio: bool = False):
 
         # ensure the server_url is a valid websocket url
         if not (server_url.startswith("ws://") or server_url.startswith("wss://")):
@@ -32,19 +36,29 @@ class Agent:
 
         self.server_url = server_url
         self.agent_name = agent_name
+        self.binary_audio = binary_audio # 是否以二进制帧发送音频 (见 protocol/audio_frame.py)
 
         self._event_handlers: dict[str, list[Callable[['Agent', TimeStampISO, EventData], None]]] = {}
+        # 预先计算的分发表：event_type -> [HandlerRunner]（同时也是处理任务的注册表）
+        self._dispatch_table: dict[str, list[HandlerRunner]] = {}
         self.ws = None
 
-        self._loop_funcs: list[Callable[['Agent'], None]] = []
+        # 调度器：启动钩子 / 定时任务 / 事件触发任务
+        self._startup_hooks: list[Callable[['Agent'], Any]] = []
+        self._shutdown_hooks: list[Callable[['Agent'], Any]] = []
+        self._interval_funcs: list[tuple[Callable[['Agent'], Any], float]] = []
+        self._triggered_funcs: list[tuple[Callable[['Agent'], Any], asyncio.Event]] = []
     
-    def on(self, event_type: str):
+    def on(self, event_type: str, policy: ConcurrencyPolicy = "parallel", max_concurrency: int = 16):
         """
         Register a handler function for a specific event type.
         Or register a loop function that will be called every time the agent receives a message. (when event_type is "loop")
         
         Args:
             event_type (str): The type of event to handle.
+            policy (ConcurrencyPolicy): How coroutine handlers run when events arrive faster than they finish.
+                "parallel" (bounded by max_concurrency), "serial", "latest" (cancel previous) or "drop" (drop when busy).
+            max_concurrency (int): Max concurrent tasks for the "parallel" policy.
         
         Reserved event types:
             "loop": The function will be called every 0.1 seconds.
@@ -55,7 +69,7 @@ class Agent:
             async def loop_func(self, timestamp: str, event_data: EventData):
                 ...
             
-            @agent.on("user_input")
+            @agent.on("user_input", policy="serial")
             async def handle_user_input(self, timestamp: str, event_data: EventData):
                 ...
             ```
@@ -64,19 +78,108 @@ class Agent:
             if event_type not in self._event_handlers:
                 self._event_handlers[event_type] = []
             self._event_handlers[event_type].append(func)
+            if event_type != "loop":
+                runner = HandlerRunner(self, func, policy, max_concurrency)
+                self._dispatch_table.setdefault(event_type, []).append(runner)
             return func
         return decorator
     
     def loop(self, func: Callable[['Agent'], Any]):
         """
-        Register a loop function that will be called every time the agent receives a message.
+        Register a loop function that will be called every 0.1 seconds.
+        Prefer `every`, `on_start` or `when`, which do not wake up the agent needlessly.
         
         Args:
             func (Callable[['Agent'], Any]): The loop function to register.
         """
-        self._loop_funcs.append(func)
+        return self.every(0.1)(func)
+
+    def on_start(self, func: Callable[['Agent'], Any]):
+        """
+        Register a startup hook that will be called exactly once, after connecting to the server.
+
+        Usage:
+            ```
+            @agent.on_start
+            async def bootstrap(self):
+                ...
+            ```
+        """
+        self._startup_hooks.append(func)
+        return func
+
+    def on_stop(self, func: Callable[['Agent'], Any]):
+        """
+        Register a shutdown hook that will be called once, after the connection to the server is closed.
+        Use it to release connections / worker processes.
+
+        Usage:
+            ```
+            @agent.on_stop
+            async def cleanup(self):
+                ...
+            ```
+        """
+        self._shutdown_hooks.append(func)
         return func
 
+    def every(self, period: float):
+        """
+        Register an interval task that will be called every `period` seconds.
+
+        Args:
+            period (float): The interval in seconds.
+
+        Usage:
+            ```
+            @agent.every(5)
+            async def heartbeat(self):
+                ...
+            ```
+        """
+        def decorator(func: Callable[['Agent'], Any]):
+            self._interval_funcs.append((func, period))
+            return func
+        return decorator
+
+    def when(self, event: asyncio.Event):
+        """
+        Register a task that will be called every time `event` is set. (The event is cleared before each call.)
+
+        Args:
+            event (asyncio.Event): The trigger event.
+
+        Usage:
+            ```
+            script_updated = asyncio.Event()
+
+            @agent.when(script_updated)
+            async def reload_script(self):
+                ...
+            ```
+        """
+        def decorator(func: Callable[['Agent'], Any]):
+            self._triggered_funcs.append((func, event))
+            return func
+        return decorator
+
+    async def _call(self, func: Callable[['Agent'], Any]):
+        if asyncio.iscoroutinefunction(func):
+            await func(self)
+        else:
+            func(self)
+
+    async def _run_interval(self, func: Callable[['Agent'], Any], period: float):
+        while True:
+            await self._call(func)
+            await asyncio.sleep(period)
+
+    async def _run_triggered(self, func: Callable[['Agent'], Any], event: asyncio.Event):
+        while True:
+            await event.wait()
+            event.clear()
+            await self._call(func)
+
     async def emit(self, event_data: dict):
         """
         Emit an event to the server.
@@ -85,59 +188,96 @@ class Agent:
             event_data (dict): The event data to emit.
         """
         if self.ws:
+            # NOTE: 服务器对 '{"type": "event", "data": ...}' 格式直接切出 data 转发，其他键顺序会退回完整解析
             await self.ws.send(json.dumps({"type": "event", "data": event_data}))
 
-    async def check_message(self):
+    async def emit_audio(self, media_data: bytes, content: str = "", format: str = "wav", **extra):
         """
-        Handle an event message.
+        Emit a say_aloud event carrying audio.
+        Sent as a binary frame when binary_audio is enabled, otherwise as JSON with base64 media_data.
+
+        Args:
+            media_data (bytes): The raw audio bytes.
+            content (str): The display text (subtitle) for this chunk.
+            format (str): The audio format.
+            **extra: Extra event fields, e.g. seq, is_last.
         """
         if not self.ws:
             return
+        if self.binary_audio:
+            header = {"type": "say_aloud", "content": content, "format": format, **extra}
+            await self.ws.send(pack_audio_frame(header, media_data))
+        else:
+            base64_data = base64.b64encode(media_data).decode("utf-8")
+            await self.emit({"type": "say_aloud", "content": content, "media_data": base64_data, "format": format, **extra})
 
+    async def emit_end_of_utterance(self, format: str = "pcm", **extra):
+        """
+        Emit an empty say_aloud frame marked with is_last, sent once the last audio chunk of an utterance is known
+        (the server flushes the Opus encoder on it). WAV / PCM utterances end with an empty "pcm" continuation frame.
+
+        Args:
+            format (str): Format of the utterance's audio frames.
+            **extra: Extra event fields, e.g. seq.
+        """
+        await self.emit_audio(b"", "", "pcm" if format in ("wav", "pcm") else format, is_last=True, **extra)
+
+    def decode_message(self, message: str | bytes) -> dict | None:
+        """
+        Decode a message received from the server.
+        """
         try:
-            message = await asyncio.wait_for(self.ws.recv(), timeout=0.1)
             message = json.loads(message)
-            return message
-        except (json.JSONDecodeError, asyncio.TimeoutError):
+        except json.JSONDecodeError:
             return None
+        return message if type(message) is dict else None
+
+    def dispatch(self, message: dict):
+        """
+        Dispatch an event message to the registered handlers.
+        """
+        event_data = message.get("data", {})
+        if type(event_data) is not dict:
+            return
+
+        runners = self._dispatch_table.get(event_data.get("type", ""))
+        if not runners:
+            return
+
+        print(f"智能体 {self.agent_name} 接收事件: {message}") # DEBUG
+
+        time_iso: str = message.get("time", "")
+        for runner in runners:
+            runner.submit(time_iso, event_data)
+
+    def handler_stats(self) -> dict[str, list[dict]]:
+        """
+        Get metrics of all event handlers (queue depth, running tasks, latency, ...).
+
+        Returns:
+            dict[str, list[dict]]: event_type -> metrics of each handler
+        """
+        return {
+            event_type: [runner.snapshot() for runner in runners]
+            for event_type, runners in self._dispatch_table.items()
+        }
 
     async def main_loop(self):
-        while True:
-            try:
-                # print("main loop alive")
-
-                # print("[main loop] receiving message...") # DEBUG
-                message = await self.check_message()
-                if not message:
-                    continue
-                print(f"智能体 {self.agent_name} 接收事件: {message}") # DEBUG
-
-                if type(message) is not dict:
-                    continue
-
-                time_iso: str = message.get("time", "")
-                event_data: dict = message.get("data", {})
-                event_type: str = event_data.get("type", "")
-
-                print(self._event_handlers.get(event_type, None)) # DEBUG
-
-                # event handlers
-                if event_type != "loop" and event_type in self._event_handlers:
-                    for handler in self._event_handlers[event_type]:
-                        if asyncio.iscoroutinefunction(handler):
-                            asyncio.create_task(handler(self, time_iso, event_data))
-                        else:
-                            handler(self, time_iso, event_data)
-
-                # 例如：await self.handle_event(message)
-            except websockets.ConnectionClosed:
-                # 连接断开，退出循环
-                break
-    
-    async def event_loop(self):
-        while True:
-            await asyncio.sleep(0.1)
+        """
+        Receive messages from the server and dispatch them as soon as they arrive.
+        """
+        if not self.ws:
+            return
 
+        try:
+            async for raw_message in self.ws:
+                message = self.decode_message(raw_message)
+                if message:
+                    self.dispatch(message)
+        except websockets.ConnectionClosed:
+            # 连接断开，退出循环
+            pass
+    
     async def run(self):
         """
         Agent main loop
@@ -147,20 +287,25 @@ class Agent:
         async with websockets.connect(uri) as ws:
             self.ws = ws
 
-            tasks = []
-            tasks.append(asyncio.create_task(self.main_loop()))
+            main_task = asyncio.create_task(self.main_loop())
 
-            for func in self._loop_funcs:
-                async def loop_func(agent):
-                    while True:
-                        if asyncio.iscoroutinefunction(func):
-                            await func(agent)
-                        else:
-                            func(agent)
-                        await asyncio.sleep(0.1)
-                tasks.append(asyncio.create_task(loop_func(self)))
+            for hook in self._startup_hooks:
+                await self._call(hook)
 
-            for task in tasks:
-                await task
+            tasks = [asyncio.create_task(self._run_interval(func, period)) for func, period in self._interval_funcs]
+            tasks += [asyncio.create_task(self._run_triggered(func, event)) for func, event in self._triggered_funcs]
 
-                
+            try:
+                await main_task
+            finally:
+                # 连接断开后停止所有调度任务和事件处理任务
+                for task in tasks:
+                    task.cancel()
+                for runners in self._dispatch_table.values():
+                    for runner in runners:
+                        runner.cancel_all()
+                for hook in self._shutdown_hooks:
+                    try:
+                        await self._call(hook)
+                    except Exception as e:
+                        print(f"[Error] shutdown hook {getattr(hook, '__name__', hook)} failed: {e}")
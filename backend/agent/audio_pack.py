@@ -0,0 +1,106 @@
+"""
+Pre-rendered lecture audio pack
+
+讲稿是静态的，可以提前把每句话合成好保存到磁盘，讲课时直接读取，不再调用 TTS。
+
+目录结构:
+    <pack_dir>/
+        index.json      索引
+        <hash>.wav      每句一个文件，以句子文本哈希命名
+        ...
+
+index.json:
+    {
+        "format": "wav",
+        "entries": [
+            {"page_num": 1, "sentence": "...", "hash": "<sha1>", "file": "<sha1 前 16 位>.wav", "offset": 44, "duration": 1.23},
+            ...
+        ]
+    }
+
+offset 为音频数据 (WAV data chunk) 在文件中的字节偏移，duration 单位为秒。
+句子按文本哈希查找，讲稿修改后只有文本变化的句子需要重新合成。
+"""
+from typing import Optional
+
+import hashlib
+import json
+import os
+
+from tts.audio_process import wav_info
+
+INDEX_FILE = "index.json"
+
+def text_hash(text: str) -> str:
+    """句子的哈希（忽略首尾空白）"""
+    return hashlib.sha1(text.strip().encode("utf-8")).hexdigest()
+
+class AudioPack:
+    def __init__(self, pack_dir: str):
+        self.pack_dir = pack_dir
+        self.format = "wav"
+        self.entries: list[dict] = []
+        self._by_hash: dict[str, dict] = {}
+
+    @classmethod
+    def load(cls, pack_dir: str) -> Optional['AudioPack']:
+        """读取音频包，不存在时返回 None"""
+        index_path = os.path.join(pack_dir, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return None
+
+        pack = cls(pack_dir)
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        pack.format = index.get("format", "wav")
+        for entry in index.get("entries", []):
+            if os.path.exists(os.path.join(pack_dir, entry["file"])):
+                pack._append(entry)
+        return pack
+
+    def get(self, sentence: str) -> Optional[dict]:
+        return self._by_hash.get(text_hash(sentence))
+
+    def read(self, entry: dict) -> bytes:
+        with open(os.path.join(self.pack_dir, entry["file"]), "rb") as f:
+            return f.read()
+
+    def add(self, page_num: int, sentence: str, wav_data: bytes) -> dict:
+        """写入一句话的音频并加入索引"""
+        os.makedirs(self.pack_dir, exist_ok=True)
+
+        sentence_hash = text_hash(sentence)
+        file_name = f"{sentence_hash[:16]}.{self.format}"
+        with open(os.path.join(self.pack_dir, file_name), "wb") as f:
+            f.write(wav_data)
+
+        offset, duration = wav_info(wav_data)
+        return self._append({
+            "page_num": page_num,
+            "sentence": sentence,
+            "hash": sentence_hash,
+            "file": file_name,
+            "offset": offset,
+            "duration": duration,
+        })
+
+    def reuse(self, page_num: int, sentence: str, entry: dict) -> dict:
+        """复用已合成的音频（文本哈希相同）"""
+        return self._append({**entry, "page_num": page_num, "sentence": sentence})
+
+    def _append(self, entry: dict) -> dict:
+        self.entries.append(entry)
+        self._by_hash.setdefault(entry["hash"], entry)
+        return entry
+
+    def prune(self):
+        """删除索引中不再引用的音频文件"""
+        used = {entry["file"] for entry in self.entries}
+        for file_name in os.listdir(self.pack_dir):
+            if file_name.endswith(f".{self.format}") and file_name not in used:
+                os.remove(os.path.join(self.pack_dir, file_name))
+
+    def save(self):
+        os.makedirs(self.pack_dir, exist_ok=True)
+        with open(os.path.join(self.pack_dir, INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump({"format": self.format, "entries": self.entries}, f, ensure_ascii=False, indent=4)
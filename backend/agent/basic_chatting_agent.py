@@ -3,16 +3,15 @@ Basic chatting agent
 """
 from .abstract_agent import Agent, EventData
 
-import base64
 import asyncio
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from stream_node import SentenceSepNode, BracketsParsorNode, LambdaNode
+from stream_node import SentenceSepNode, BracketsParsorNode, LambdaNode, StreamGraph
 from llm_api import create_bot
 from tts import create_tts
-from tts.pcm2wav import pcm2wav
+from tts.pcm2wav import WavStreamFramer
 
 from config_types import LLM_Config, TTS_Config
 
@@ -20,14 +19,27 @@ def is_empty(content: str) -> bool:
     return not content.strip()
 
 class BasicChattingAgent(Agent):
-    def __init__(self, server_url: str, agent_name: str, llm_api_config: LLM_Config, tts_config: TTS_Config, tts_stream: bool = False):
-        super().__init__(server_url, agent_name)
+    def __init__(self, server_url: str, agent_name: str, llm_api_config: LLM_Config, tts_config: TTS_Config, tts_stream: bool = False, binary_audio: bool = False, tts_lookahead: int = 2, tts_incremental: bool = False, concurrent_pipeline: bool = False, pipeline_metrics_interval: float = 0):
+        super().__init__(server_url, agent_name, binary_audio)
 
         self.llm = create_bot(**llm_api_config)
         self.tts = create_tts(**tts_config)
 
         self.tts_stream = tts_stream
 
+        # 预合成流水线：当前句子播报时，后面最多 tts_lookahead 句已在并发合成
+        # 队列元素：("text", content, 音频块队列)、("tag", content, None) 或增量模式下的 ("stream", content, (音频块, 字幕) 队列)，按顺序发送
+        self.tts_lookahead = max(1, tts_lookahead)
+        self._speech_queue: asyncio.Queue = asyncio.Queue(maxsize=self.tts_lookahead)
+        self._speech_task: asyncio.Task | None = None
+        self._synthesis_tasks: set[asyncio.Task] = set()
+
+        # 增量合成：整轮回复的文本送入同一个实时会话，音频连续返回（需要 TTS 支持 synthesize_incremental）
+        if tts_incremental and not hasattr(self.tts, "synthesize_incremental"):
+            raise ValueError(f"{type(self.tts).__name__} does not support incremental synthesis")
+        self.tts_incremental = tts_incremental
+        self._text_feed: asyncio.Queue | None = None
+
         # streaming workflow: sentence_sep -> brackets_parsor -> event_emitter
         # self.sentence_sep_node = SentenceSepNode(seps = "',.:;?!，。：；？！\n")
         self.sentence_sep_node = SentenceSepNode(seps = "'.:;?!。：；？！\n") # ignore comma
@@ -36,11 +48,22 @@ class BasicChattingAgent(Agent):
         async def event_emitter_lambda(_, data):
             await self.handle_event(data)
 
-        self.event_emitter = LambdaNode(event_emitter_lambda)
+        # 结束时关闭增量合成的文本输入，打断时丢弃排队中的语音
+        self.event_emitter = LambdaNode(
+            event_emitter_lambda,
+            on_end_of_stream = lambda _: self.end_text_feed(),
+            on_interrupt = lambda _: self.cancel_speech(),
+        )
+        self.event_emitter.name = "EventEmitter"
 
         self.sentence_sep_node.connect_to(self.brackets_parsor_node)
         self.brackets_parsor_node.connect_to(self.event_emitter)
 
+        # concurrent_pipeline: 每个节点独立运行，合成排队时不阻塞分句和 LLM 增量的消费
+        self.pipeline = StreamGraph(self.sentence_sep_node, concurrent=concurrent_pipeline)
+        if pipeline_metrics_interval > 0:
+            self.pipeline.enable_metrics(log_interval=pipeline_metrics_interval)
+
         # self.sentence_sep_node.connect_to(LambdaNode(lambda _, data: print("sentence_sep:", data, flush=True))) # DEBUG
         # self.brackets_parsor_node.connect_to(LambdaNode(lambda _, data: print("brackets_parsor:", data, flush=True))) # DEBUG
         # self.event_emitter.connect_to(LambdaNode(lambda _, data: print("event_emitter:", data, flush=True))) # DEBUG
@@ -49,7 +72,16 @@ class BasicChattingAgent(Agent):
 
         self._curr_task: asyncio.Task = None
 
-        @self.on("user_input")
+        @self.on_start
+        async def warm_up_tts(_):
+            await self.tts.warm_up()
+
+        @self.on_stop
+        async def shutdown(_):
+            await self.pipeline.close()
+            await self.tts.shutdown()
+
+        @self.on("user_input", policy="serial")
         async def handle_user_input(_, timestamp: str, event_data: EventData):
             """
             Handle user input event
@@ -103,12 +135,13 @@ class BasicChattingAgent(Agent):
                     await self.emit({"type": "flip_ppt_page", "page_num": page_num})
             
             # 2. 然后处理文本和TTS合成 - 低优先级，可延迟
-            await self.sentence_sep_node.handle(content_chunk)
+            await self.pipeline.handle(content_chunk)
         
         @self.llm.on("done")
         async def handle_done(data):
             self.llm.messages.append({"role": "assistant", "content": data["content"]})
-            await self.sentence_sep_node.handle(" ")
+            await self.pipeline.flush() # 立即输出未结束的句子和未闭合的括号
+            await self._speech_queue.join() # 等待本轮语音全部发送
             await self.emit({"type": "end_of_response", "response": data["content"]})
             
             # 检查AI回复中是否包含PPT翻页指令
@@ -138,7 +171,7 @@ class BasicChattingAgent(Agent):
             if len(self.llm.messages) > 0 and self.llm.messages[-1].get("role") != "assistant":
                 self.llm.messages.insert(-1, {"role": "assistant", "content": f"{self._curr_agent_response}"})
                 should_interrupt = True
-            self.sentence_sep_node.reset()
+            self.pipeline.interrupt()
 
         return should_interrupt
     
@@ -157,6 +190,120 @@ class BasicChattingAgent(Agent):
     #         print(f"Error encoding wav to base64: {e}")
     #         return ""
         
+    def cancel_speech(self):
+        """
+        Cancel all pending synthesis and drop queued speech
+        """
+        if self._speech_task:
+            self._speech_task.cancel()
+            self._speech_task = None
+        for task in self._synthesis_tasks:
+            task.cancel()
+        self._synthesis_tasks.clear()
+        self._speech_queue = asyncio.Queue(maxsize=self.tts_lookahead)
+        self._text_feed = None
+
+    async def synthesize_into(self, content: str, chunks: asyncio.Queue):
+        """
+        Synthesize content, putting (frame, format) into `chunks` (None marks the end).
+        The first frame of a sentence is a WAV file, the rest are raw PCM continuation frames.
+        """
+        framer = WavStreamFramer.for_tts(self.tts, stream=self.tts_stream)
+        try:
+            if self.tts_stream:
+                async for media_data in self.tts.synthesize_stream(content):
+                    chunks.put_nowait(framer.frame(media_data))
+            else:
+                media_data = await self.tts.synthesize(content)
+                chunks.put_nowait(framer.frame(media_data))
+        except Exception as e:
+            print(f"TTS合成出错: {e}")
+        finally:
+            chunks.put_nowait(None)
+
+    async def synthesize_incremental_into(self, text_feed: asyncio.Queue, chunks: asyncio.Queue):
+        """
+        Incremental mode: synthesize the text fed into `text_feed` (None marks the end) in one session,
+        putting (frame, format, subtitle) into `chunks` (None marks the end)
+        """
+        pending_text: list[str] = [] # 已送出、还没作为字幕发送的文本
+        framer = WavStreamFramer.for_tts(self.tts, stream=True)
+
+        async def texts():
+            while (text := await text_feed.get()) is not None:
+                pending_text.append(text)
+                yield text
+
+        try:
+            async for media_data in self.tts.synthesize_incremental(texts()):  # type: ignore[attr-defined]
+                display_text = "".join(pending_text)
+                pending_text.clear()
+                chunks.put_nowait((*framer.frame(media_data), display_text))
+        except Exception as e:
+            print(f"TTS合成出错: {e}")
+        finally:
+            chunks.put_nowait(None)
+
+    async def feed_text(self, content: str):
+        """
+        Incremental mode: feed text into the realtime session of the current response
+        """
+        if self._text_feed is None:
+            self._text_feed = asyncio.Queue()
+            chunks = asyncio.Queue()
+            await self._speech_queue.put(("stream", content, chunks))
+            task = asyncio.create_task(self.synthesize_incremental_into(self._text_feed, chunks))
+            self._synthesis_tasks.add(task)
+            task.add_done_callback(self._synthesis_tasks.discard)
+        self._text_feed.put_nowait(content)
+
+    def end_text_feed(self):
+        if self._text_feed is not None:
+            self._text_feed.put_nowait(None)
+            self._text_feed = None
+
+    async def emit_utterance(self, chunks: asyncio.Queue, content: str | None = None):
+        """
+        Emit the audio chunks of one utterance as they arrive, followed by an empty is_last frame
+        (see `emit_end_of_utterance`).
+
+        Args:
+            chunks (asyncio.Queue): (frame, format) items, or (frame, format, subtitle) when `content` is None; None marks the end.
+            content (str | None): Subtitle carried by the first chunk.
+        """
+        display_text = content
+        format = None
+
+        while (item := await chunks.get()) is not None:
+            format = item[1]
+            if content is None:
+                await self.emit_audio(item[0], item[2], format, is_last=False)
+            else:
+                await self.emit_audio(item[0], display_text, format, is_last=False)
+                display_text = ""
+
+        if format is not None:
+            await self.emit_end_of_utterance(format)
+
+    async def speech_loop(self, speech_queue: asyncio.Queue):
+        """
+        Emit queued speech strictly in order
+        """
+        while True:
+            data_type, content, chunks = await speech_queue.get()
+            try:
+                if data_type == "text":
+                    # 首个音频块携带字幕
+                    await self.emit_utterance(chunks, content)
+                elif data_type == "stream":
+                    await self.emit_utterance(chunks)
+                elif data_type == "tag":
+                    await self.emit({"type": "bracket_tag", "content": content})
+            except Exception as e:
+                print(f"发送语音出错: {e}")
+            finally:
+                speech_queue.task_done()
+
     async def handle_event(self, data: dict):
             """
             Handle event
@@ -166,33 +313,26 @@ class BasicChattingAgent(Agent):
 
             await asyncio.sleep(0) # check point (to check if the conversation is interrupted)
 
+            if self._speech_task is None:
+                self._speech_task = asyncio.create_task(self.speech_loop(self._speech_queue))
+
             if data_type == "text":
                 self._curr_agent_response += content
 
-                # TTS合成 - 同步处理以确保字幕显示正确
-                try:
-                    if self.tts_stream:
-                        first_pack = True
-                        async for media_data in self.tts.synthesize_stream(content):
-                            if self.tts.format == "pcm":
-                                media_data = pcm2wav(media_data, sample_rate=self.tts.sample_rate, channels=self.tts.channels, bits_per_sample=self.tts.bits_per_sample)
-                            base64_data = base64.b64encode(media_data).decode("utf-8")
-
-                            if first_pack:
-                                first_pack = False
-                                display_text = content
-                            else:
-                                display_text = ""
-
-                            await self.emit({"type": "say_aloud", "content": display_text, "media_data": base64_data, "format": "wav"})
-                    else:
-                        media_data = await self.tts.synthesize(content)
-                        if self.tts.format == "pcm":
-                            media_data = pcm2wav(media_data, sample_rate=self.tts.sample_rate, channels=self.tts.channels, bits_per_sample=self.tts.bits_per_sample)
-                        base64_data = base64.b64encode(media_data).decode("utf-8")
-                        await self.emit({"type": "say_aloud", "content": content, "media_data": base64_data, "format": "wav"})
-                except Exception as e:
-                    print(f"TTS合成出错: {e}")
+                if self.tts_incremental:
+                    await self.feed_text(content)
+                    return
+
+                # 入队后立即开始合成，不等待前面的句子播报完成（队列满时在此等待，限制预合成深度）
+                chunks = asyncio.Queue()
+                await self._speech_queue.put(("text", content, chunks))
+                task = asyncio.create_task(self.synthesize_into(content, chunks))
+                self._synthesis_tasks.add(task)
+                task.add_done_callback(self._synthesis_tasks.discard)
             elif data_type == "tag":
                 self._curr_agent_response += f"[{content}]"
-                await self.emit({"type": "bracket_tag", "content": content})
\ No newline at end of file
+                if self.tts_incremental:
+                    # 增量模式下语音连续播放，动作标签直接发送
+                    await self.emit({"type": "bracket_tag", "content": content})
+                    return
+                await self._speech_queue.put(("tag", content, None))
@@ -0,0 +1,135 @@
+"""
+Handler runner: concurrency policy, task registry and metrics for agent event handlers
+"""
+from typing import Literal, Callable, Any
+from collections import deque
+
+import asyncio
+import time
+
+ConcurrencyPolicy = Literal["parallel", "serial", "latest", "drop"]
+
+class HandlerRunner:
+    """
+    Run one event handler under a concurrency policy.
+
+    Policies:
+        "parallel": at most `max_concurrency` tasks at once, excess events wait in a queue
+        "serial": one task at a time, events are handled in arrival order
+        "latest": a new event cancels the running task (latest wins)
+        "drop": events arriving while a task is running are dropped
+
+    Every started task is kept in `self.tasks` until it finishes, so it can not be garbage-collected mid-flight.
+    """
+    def __init__(self, agent, handler: Callable, policy: ConcurrencyPolicy = "parallel",
+                 max_concurrency: int = 16, max_queue_size: int = 256):
+        if policy not in ("parallel", "serial", "latest", "drop"):
+            raise ValueError(f"Unknown concurrency policy: {policy}")
+
+        self.agent = agent
+        self.handler = handler
+        self.policy = policy
+        self.max_concurrency = 1 if policy == "serial" else max_concurrency
+        self.max_queue_size = max_queue_size
+        self.is_coroutine = asyncio.iscoroutinefunction(handler)
+
+        self.tasks: set[asyncio.Task] = set()
+        # 等待执行的事件：(time_iso, event_data, submit_time)
+        self.pending: deque[tuple[str, dict, float]] = deque()
+
+        # metrics
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.dropped = 0
+        self.max_queue_depth = 0
+        self.total_wait_time = 0.0
+        self.total_run_time = 0.0
+        self.max_latency = 0.0
+
+    def submit(self, time_iso: str, event_data: dict):
+        """
+        Submit an event to the handler. Never blocks.
+        """
+        self.submitted += 1
+
+        if not self.is_coroutine:
+            self.handler(self.agent, time_iso, event_data)
+            self.completed += 1
+            return
+
+        now = time.perf_counter()
+
+        if self.policy == "latest":
+            self.cancel_all()
+            self._start(time_iso, event_data, now)
+            return
+
+        if self.policy == "drop" and self.tasks:
+            self.dropped += 1
+            return
+
+        if len(self.tasks) < self.max_concurrency:
+            self._start(time_iso, event_data, now)
+            return
+
+        if len(self.pending) >= self.max_queue_size:
+            # 队列已满，丢弃最早的事件
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append((time_iso, event_data, now))
+        self.max_queue_depth = max(self.max_queue_depth, len(self.pending))
+
+    def _start(self, time_iso: str, event_data: dict, submit_time: float):
+        start_time = time.perf_counter()
+        self.total_wait_time += start_time - submit_time
+
+        task = asyncio.create_task(self.handler(self.agent, time_iso, event_data))
+        self.tasks.add(task)
+        task.add_done_callback(lambda t: self._on_done(t, submit_time, start_time))
+
+    def _on_done(self, task: asyncio.Task, submit_time: float, start_time: float):
+        self.tasks.discard(task)
+
+        end_time = time.perf_counter()
+        self.total_run_time += end_time - start_time
+        self.max_latency = max(self.max_latency, end_time - submit_time)
+
+        if task.cancelled():
+            self.cancelled += 1
+        elif task.exception() is not None:
+            self.failed += 1
+            print(f"[Error] 事件处理函数 {self.handler.__name__} 出错: {task.exception()!r}")
+        else:
+            self.completed += 1
+
+        while self.pending and len(self.tasks) < self.max_concurrency:
+            self._start(*self.pending.popleft())
+
+    def cancel_all(self):
+        """
+        Cancel all running tasks and drop all pending events.
+        """
+        self.dropped += len(self.pending)
+        self.pending.clear()
+        for task in list(self.tasks):
+            task.cancel()
+
+    def snapshot(self) -> dict[str, Any]:
+        finished = self.completed + self.failed + self.cancelled
+        return {
+            "handler": self.handler.__name__,
+            "policy": self.policy,
+            "running": len(self.tasks),
+            "queue_depth": len(self.pending),
+            "max_queue_depth": self.max_queue_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "dropped": self.dropped,
+            "avg_wait_time": self.total_wait_time / finished if finished else 0.0,
+            "avg_run_time": self.total_run_time / finished if finished else 0.0,
+            "max_latency": self.max_latency,
+        }
@@ -4,9 +4,9 @@ Lecture agent: play scripts generated by ppt_script
 from __future__ import annotations
 
 from .abstract_agent import Agent, EventData
+from .audio_pack import AudioPack
 
 import asyncio
-import base64
 import os
 import re
 import sys
@@ -15,9 +15,9 @@ from typing import List, Dict, Optional
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from stream_node import SentenceSepNode, BracketsParsorNode, LambdaNode
+from stream_node import SentenceSepNode, BracketsParsorNode, LambdaNode, AccumulativeListNode, StreamGraph
 from tts import create_tts
-from tts.pcm2wav import pcm2wav
+from tts.pcm2wav import pcm2wav, WavStreamFramer
 
 from config_types import TTS_Config
 
@@ -49,9 +49,14 @@ class LectureAgent(Agent):
         ppt_images_dir: str | None = None,
         ppt_base_url: str = "/documents/slides",
         auto_start: bool = True,
+        binary_audio: bool = False,
+        prefetch_depth: int = 2,
+        audio_pack_dir: str | None = None,
+        concurrent_pipeline: bool = False,
+        pipeline_metrics_interval: float = 0,
         **_kwargs,
     ):
-        super().__init__(server_url, agent_name)
+        super().__init__(server_url, agent_name, binary_audio)
 
         self.tts = create_tts(**tts_config)
         self.tts_stream = tts_stream
@@ -61,16 +66,28 @@ class LectureAgent(Agent):
         self.ppt_base_url = ppt_base_url.rstrip("/")
         self.auto_start = auto_start
 
+        # 预渲染音频包，默认位于讲稿旁的 <讲稿名>_audio 目录
+        self.audio_pack_dir = audio_pack_dir
+        self.audio_pack: Optional[AudioPack] = None
+
         self._scripts: List[Dict] = []
         self._curr_index: int = 0
         self._play_task: Optional[asyncio.Task] = None
         self._pause_event = asyncio.Event()
         self._pause_event.set()
-        self._started = False
         self._audio_seq = 0
         self._audio_waiters: dict[int, asyncio.Future] = {}
         self._audio_wait_timeout = 300
 
+        # 预合成：讲稿已知，在前端播放当前句时提前合成后面最多 prefetch_depth 句
+        # 播放队列元素：("event", page_index, event_data, None) 或 ("text", page_index, content, 音频块队列)
+        self.prefetch_depth = max(1, prefetch_depth)
+        self._playback_queue: asyncio.Queue = asyncio.Queue()
+        self._prefetch_slots = asyncio.BoundedSemaphore(self.prefetch_depth)
+        self._playback_task: Optional[asyncio.Task] = None
+        self._synthesis_tasks: set[asyncio.Task] = set()
+        self._prefetch_index: int = 0
+
         # streaming workflow: sentence_sep -> brackets_parsor -> event_emitter
         self.sentence_sep_node = SentenceSepNode(seps="\n")
         self.brackets_parsor_node = BracketsParsorNode()
@@ -78,12 +95,17 @@ class LectureAgent(Agent):
         async def event_emitter_lambda(_, data):
             await self.handle_event(data)
 
-        self.event_emitter = LambdaNode(event_emitter_lambda)
+        self.event_emitter = LambdaNode(event_emitter_lambda, on_interrupt=lambda _: self.cancel_speech())
+        self.event_emitter.name = "EventEmitter"
 
         self.sentence_sep_node.connect_to(self.brackets_parsor_node)
         self.brackets_parsor_node.connect_to(self.event_emitter)
 
-        @self.on("lecture_control")  # type: ignore[misc]
+        self.pipeline = StreamGraph(self.sentence_sep_node, concurrent=concurrent_pipeline)
+        if pipeline_metrics_interval > 0:
+            self.pipeline.enable_metrics(log_interval=pipeline_metrics_interval)
+
+        @self.on("lecture_control", policy="serial")  # type: ignore[misc]
         async def handle_lecture_control(_, timestamp: str, event_data: EventData):
             action = event_data.get("action", "")
             page = event_data.get("page")
@@ -99,27 +121,34 @@ class LectureAgent(Agent):
             if waiter and not waiter.done():
                 waiter.set_result(True)
 
-        self.loop(self._bootstrap_loop)  # type: ignore[arg-type]
+        self.on_start(self._bootstrap)  # type: ignore[arg-type]
+        self.on_stop(self._shutdown)  # type: ignore[arg-type]
 
-    async def _bootstrap_loop(self, _agent: "LectureAgent"):
-        if self._started:
-            await asyncio.sleep(0.1)
-            return
+    async def _shutdown(self, _agent: "LectureAgent"):
+        await self.pipeline.close()
+        await self.tts.shutdown()
+
+    async def _bootstrap(self, _agent: "LectureAgent"):
+        await self.tts.warm_up()
 
         if self.lecture_script_path:
             self._scripts = self.load_scripts(self.lecture_script_path)
         else:
             self._scripts = []
 
+        pack_dir = self._get_audio_pack_dir()
+        if pack_dir:
+            self.audio_pack = AudioPack.load(pack_dir)
+            if self.audio_pack:
+                print(f"已加载音频包: {pack_dir} ({len(self.audio_pack.entries)} 句)")
+
         if self.ppt_images_dir:
             await self.emit_ppt_assets(self.ppt_images_dir)
 
         if self.auto_start and self._scripts:
             await self.start_from_index(0)
 
-        self._started = True
-
-    def load_scripts(self, script_path: str) -> List[Dict]:
+    def _resolve_script_path(self, script_path: str) -> Optional[str]:
         if os.path.isdir(script_path):
             candidates = [
                 os.path.join(script_path, f)
@@ -128,13 +157,29 @@ class LectureAgent(Agent):
             ]
             candidates.sort()
             if not candidates:
-                return []
+                return None
             script_path = candidates[0]
 
         if not os.path.exists(script_path):
+            return None
+        return script_path
+
+    def _get_audio_pack_dir(self) -> Optional[str]:
+        if self.audio_pack_dir:
+            return self.audio_pack_dir
+        if not self.lecture_script_path:
+            return None
+        script_path = self._resolve_script_path(self.lecture_script_path)
+        if not script_path:
+            return None
+        return os.path.splitext(script_path)[0] + "_audio"
+
+    def load_scripts(self, script_path: str) -> List[Dict]:
+        resolved_path = self._resolve_script_path(script_path)
+        if not resolved_path:
             return []
 
-        with open(script_path, "r", encoding="utf-8") as f:
+        with open(resolved_path, "r", encoding="utf-8") as f:
             content = f.read()
         return self.parse_script(content)
 
@@ -220,10 +265,27 @@ class LectureAgent(Agent):
                 await self._play_task
             except asyncio.CancelledError:
                 pass
-        self.sentence_sep_node.reset()
+        self.pipeline.interrupt() # 同时取消播放和预合成
         self._pause_event.set()
+        self._playback_task = asyncio.create_task(self._playback_loop(self._playback_queue, self._prefetch_slots))
         self._play_task = asyncio.create_task(self._play_from_index(index))
 
+    def cancel_speech(self):
+        """
+        Cancel playback and invalidate the prefetch buffer
+        """
+        if self._playback_task:
+            self._playback_task.cancel()
+            self._playback_task = None
+        for task in self._synthesis_tasks:
+            task.cancel()
+        self._synthesis_tasks.clear()
+        for waiter in self._audio_waiters.values():
+            waiter.cancel()
+        self._audio_waiters.clear()
+        self._playback_queue = asyncio.Queue()
+        self._prefetch_slots = asyncio.BoundedSemaphore(self.prefetch_depth)
+
     def _find_index_by_page(self, page_num: int) -> Optional[int]:
         for idx, item in enumerate(self._scripts):
             if item.get("page_num") == page_num:
@@ -231,31 +293,121 @@ class LectureAgent(Agent):
         return None
 
     async def _wait_if_paused(self):
-        while not self._pause_event.is_set():
-            await asyncio.sleep(0.1)
+        await self._pause_event.wait()
 
     async def _play_from_index(self, index: int):
+        """
+        Feed the script into the playback queue (runs ahead of playback, bounded by prefetch_depth)
+        """
         try:
             for i in range(index, len(self._scripts)):
-                self._curr_index = i
-                await self._wait_if_paused()
+                self._prefetch_index = i
 
                 item = self._scripts[i]
                 page_num = item.get("page_num")
                 content = item.get("content", "")
 
                 if page_num is not None:
-                    await self.emit({"type": "flip_ppt_page", "page_num": page_num})
+                    self._enqueue_event({"type": "flip_ppt_page", "page_num": page_num})
 
-                await self.emit({"type": "start_of_response"})
+                self._enqueue_event({"type": "start_of_response"})
 
-                await self.sentence_sep_node.handle(content)
-                await self.sentence_sep_node.flush()
+                await self.pipeline.handle(content)
+                await self.pipeline.flush()
 
-                await self.emit({"type": "end_of_response", "response": content})
+                self._enqueue_event({"type": "end_of_response", "response": content})
         except asyncio.CancelledError:
             return
 
+    def _enqueue_event(self, event_data: dict):
+        self._playback_queue.put_nowait(("event", self._prefetch_index, event_data, None))
+
+    async def _playback_loop(self, playback_queue: asyncio.Queue, prefetch_slots: asyncio.BoundedSemaphore):
+        """
+        Emit queued events and audio in order, waiting for the frontend to finish playing each sentence.
+        `playback_queue` and `prefetch_slots` are captured: cancel_speech replaces them before this task finishes.
+        """
+        while True:
+            data_type, index, data, chunks = await playback_queue.get()
+            await self._wait_if_paused()
+            self._curr_index = index
+
+            if data_type == "event":
+                await self.emit(data)
+                continue
+
+            try:
+                await self._play_audio(data, chunks)
+            except Exception as e:
+                print(f"TTS合成出错: {e}")
+            finally:
+                # 释放预合成名额，下一句开始合成
+                prefetch_slots.release()
+
+    async def _play_audio(self, content: str, chunks: asyncio.Queue):
+        self._audio_seq += 1
+        seq = self._audio_seq
+        loop = asyncio.get_event_loop()
+        self._audio_waiters[seq] = loop.create_future()
+
+        # 音频块到达即发送，最后发送空的 is_last 帧，前端播放完后以 seq 回报
+        display_text = content
+        format = None
+
+        while (item := await chunks.get()) is not None:
+            format = item[1]
+            await self.emit_audio(item[0], display_text, format, seq=seq, is_last=False)
+            display_text = ""
+
+        if format is None:
+            self._audio_waiters.pop(seq, None)
+            return
+
+        await self.emit_end_of_utterance(format, seq=seq)
+
+        waiter = self._audio_waiters.get(seq)
+        if waiter:
+            try:
+                await asyncio.wait_for(waiter, timeout=self._audio_wait_timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._audio_waiters.pop(seq, None)
+
+    def _to_wav(self, media_data: bytes) -> bytes:
+        if self.tts.format == "pcm":
+            return pcm2wav(
+                media_data,
+                sample_rate=self.tts.sample_rate,
+                channels=self.tts.channels,
+                bits_per_sample=self.tts.bits_per_sample,
+            )
+        return media_data
+
+    async def synthesize_into(self, content: str, chunks: asyncio.Queue):
+        """
+        Synthesize content, putting (frame, format) into `chunks` (None marks the end).
+        The first frame of a sentence is a WAV file, the rest are raw PCM continuation frames.
+        """
+        framer = WavStreamFramer.for_tts(self.tts, stream=self.tts_stream)
+        try:
+            entry = self.audio_pack.get(content) if self.audio_pack else None
+            if _is_empty(content):
+                pass
+            elif entry:
+                # 音频包命中，直接读取，不调用 TTS
+                chunks.put_nowait((await asyncio.to_thread(self.audio_pack.read, entry), "wav"))
+            elif self.tts_stream:
+                async for media_data in self.tts.synthesize_stream(content):  # type: ignore[misc]
+                    chunks.put_nowait(framer.frame(media_data))
+            else:
+                media_data = await self.tts.synthesize(content)
+                chunks.put_nowait(framer.frame(media_data))
+        except Exception as e:
+            print(f"TTS合成出错: {e}")
+        finally:
+            chunks.put_nowait(None)
+
     async def handle_event(self, data: dict):
         data_type = data.get("type", "")
         content = data.get("content", "")
@@ -263,104 +415,79 @@ class LectureAgent(Agent):
         await asyncio.sleep(0)
 
         if data_type == "text":
-            try:
-                self._audio_seq += 1
-                seq = self._audio_seq
-                loop = asyncio.get_event_loop()
-                self._audio_waiters[seq] = loop.create_future()
-
-                if self.tts_stream:
-                    first_pack = True
-                    buffered_chunk: bytes | None = None
-
-                    async for media_data in self.tts.synthesize_stream(content):  # type: ignore[misc]
-                        if buffered_chunk is None:
-                            buffered_chunk = media_data
-                            continue
-
-                        if self.tts.format == "pcm":
-                            buffered_chunk = pcm2wav(
-                                buffered_chunk,
-                                sample_rate=self.tts.sample_rate,
-                                channels=self.tts.channels,
-                                bits_per_sample=self.tts.bits_per_sample,
-                            )
-                        base64_data = base64.b64encode(buffered_chunk).decode("utf-8")
-
-                        display_text = content if first_pack else ""
-                        first_pack = False
-
-                        await self.emit({
-                            "type": "say_aloud",
-                            "content": display_text,
-                            "media_data": base64_data,
-                            "format": "wav",
-                            "seq": seq,
-                            "is_last": False,
-                        })
-
-                        buffered_chunk = media_data
-
-                    if buffered_chunk is None:
-                        waiter = self._audio_waiters.pop(seq, None)
-                        if waiter and not waiter.done():
-                            waiter.set_result(True)
-                        return
-
-                    if self.tts.format == "pcm":
-                        buffered_chunk = pcm2wav(
-                            buffered_chunk,
-                            sample_rate=self.tts.sample_rate,
-                            channels=self.tts.channels,
-                            bits_per_sample=self.tts.bits_per_sample,
-                        )
-                    base64_data = base64.b64encode(buffered_chunk).decode("utf-8")
-
-                    display_text = content if first_pack else ""
-
-                    await self.emit({
-                        "type": "say_aloud",
-                        "content": display_text,
-                        "media_data": base64_data,
-                        "format": "wav",
-                        "seq": seq,
-                        "is_last": True,
-                    })
-                else:
-                    media_data = await self.tts.synthesize(content)
-                    if self.tts.format == "pcm":
-                        media_data = pcm2wav(
-                            media_data,
-                            sample_rate=self.tts.sample_rate,
-                            channels=self.tts.channels,
-                            bits_per_sample=self.tts.bits_per_sample,
-                        )
-                    base64_data = base64.b64encode(media_data).decode("utf-8")
-                    await self.emit({
-                        "type": "say_aloud",
-                        "content": content,
-                        "media_data": base64_data,
-                        "format": "wav",
-                        "seq": seq,
-                        "is_last": True,
-                    })
-
-                waiter = self._audio_waiters.get(seq)
-                if waiter:
-                    try:
-                        await asyncio.wait_for(waiter, timeout=self._audio_wait_timeout)
-                    except asyncio.TimeoutError:
-                        pass
-                    finally:
-                        self._audio_waiters.pop(seq, None)
-            except Exception as e:
-                print(f"TTS合成出错: {e}")
+            # 等待预合成名额（缓冲区已满时在此等待，直到前端播完一句）
+            await self._prefetch_slots.acquire()
+            chunks: asyncio.Queue = asyncio.Queue()
+            self._playback_queue.put_nowait(("text", self._prefetch_index, content, chunks))
+            task = asyncio.create_task(self.synthesize_into(content, chunks))
+            self._synthesis_tasks.add(task)
+            task.add_done_callback(self._synthesis_tasks.discard)
         elif data_type == "tag":
             tag_content = str(content)
             match = PPT_TAG_PATTERN.match(f"[{tag_content}]")
             if match:
                 page_num = match.group(1) or match.group(2)
                 if page_num:
-                    await self.emit({"type": "flip_ppt_page", "page_num": int(page_num)})
+                    self._enqueue_event({"type": "flip_ppt_page", "page_num": int(page_num)})
                 return
-            await self.emit({"type": "bracket_tag", "content": tag_content})
+            self._enqueue_event({"type": "bracket_tag", "content": tag_content})
+
+    async def split_sentences(self, content: str) -> List[str]:
+        """
+        Split one page of script into the sentences sent to TTS during playback
+        """
+        sentence_sep_node = SentenceSepNode(seps="\n")
+        brackets_parsor_node = BracketsParsorNode()
+        text_filter = LambdaNode(lambda _, data: data["content"] if data.get("type") == "text" else None)
+        sentences = AccumulativeListNode()
+
+        sentence_sep_node.connect_to(brackets_parsor_node)
+        brackets_parsor_node.connect_to(text_filter)
+        text_filter.connect_to(sentences)
+
+        pipeline = StreamGraph(sentence_sep_node, concurrent=False)
+        await pipeline.handle(content)
+        await pipeline.flush()
+        return [sentence for sentence in sentences.buffer if sentence is not None and not _is_empty(sentence)]
+
+    async def build_audio_pack(self) -> Optional[AudioPack]:
+        """
+        Render every sentence of the lecture script into the audio pack.
+        Sentences whose text is unchanged since the last build are reused.
+        """
+        pack_dir = self._get_audio_pack_dir()
+        if not pack_dir:
+            print("未找到讲稿，无法生成音频包")
+            return None
+
+        scripts = self.load_scripts(self.lecture_script_path)  # type: ignore[arg-type]
+        old_pack = AudioPack.load(pack_dir)
+        pack = AudioPack(pack_dir)
+        reused = synthesized = 0
+
+        for item in scripts:
+            page_num = item.get("page_num")
+            sentences = await self.split_sentences(item.get("content", ""))
+
+            # 每页需要合成的句子一次提交（Genie 在多个工作进程之间并行，workers=1 时逐句合成）
+            missing = [
+                sentence for sentence in dict.fromkeys(sentences)
+                if not pack.get(sentence) and not (old_pack and old_pack.get(sentence))
+            ]
+            rendered = dict(zip(missing, await self.tts.synthesize_many(missing))) if missing else {}
+
+            for sentence in sentences:
+                entry = pack.get(sentence) or (old_pack.get(sentence) if old_pack else None)
+                if entry:
+                    pack.reuse(page_num, sentence, entry)
+                    reused += 1
+                    continue
+
+                pack.add(page_num, sentence, self._to_wav(rendered[sentence]))
+                synthesized += 1
+                print(f"[{page_num}] {sentence}")
+
+        pack.save()
+        pack.prune()
+        print(f"音频包已生成: {pack_dir} (合成 {synthesized} 句，复用 {reused} 句)")
+        return pack
@@ -1,6 +1,6 @@
 # config classes
 from pydantic import BaseModel, ConfigDict
-from typing import Iterator, Tuple, Any, Union
+from typing import Iterator, Tuple, Any, Union, Optional
 
 class CompatibaleModel(BaseModel):
     """support dict-like access & extra fields"""
@@ -46,6 +46,10 @@ class Genie_TTS_Config(CompatibaleModel):
     ref_audio_path: str
     ref_audio_text: str
     ref_audio_language: str
+    workers: int = 1 # 推理工作进程数，每个进程各自加载一份模型
+    intra_op_threads: int = 0 # 每个工作进程的 ONNX intra-op 线程数，0 为 onnxruntime 默认值
+    cache_max_bytes: int = 0 # TTS 结果缓存的内存上限，0 为不使用内存缓存
+    cache_dir: Optional[str] = None # TTS 结果磁盘缓存目录
 
 class Dashscope_TTS_Config(CompatibaleModel):
     """
@@ -55,6 +59,9 @@ class Dashscope_TTS_Config(CompatibaleModel):
     api_key: str
     model: str
     voice: str
+    pool_size: int = 2 # 保持预热的实时合成会话数
+    cache_max_bytes: int = 0 # TTS 结果缓存的内存上限，0 为不使用内存缓存
+    cache_dir: Optional[str] = None # TTS 结果磁盘缓存目录
 
 TTS_Config = Union[Genie_TTS_Config, Dashscope_TTS_Config]
 
@@ -66,3 +73,8 @@ class AgentConfig(CompatibaleModel):
     agent_name: str
     llm_api_config: LLM_Config
     tts_stream: bool = False
+    tts_lookahead: int = 2
+    tts_incremental: bool = False
+    concurrent_pipeline: bool = False # 分句 / 括号解析 / 发送各自作为独立任务运行
+    pipeline_metrics_interval: float = 0 # 每隔若干秒打印流节点的统计，0 为不统计
+    binary_audio: bool = False
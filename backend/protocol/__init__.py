@@ -0,0 +1,5 @@
+"""
+WebSocket message protocol shared by server and agents
+"""
+from .audio_frame import pack_audio_frame, unpack_audio_frame, audio_frame_to_event
+from .audio_codec import OpusStreamEncoder, split_opus_packets
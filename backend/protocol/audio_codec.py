@@ -0,0 +1,171 @@
+"""
+Compressed audio transport
+
+say_aloud 的音频默认为未压缩的 WAV / PCM（24 kHz 16 bit 约 48 KB/s）。
+前端连接时带上 ?codec=opus 即可改为接收 Opus 音频，由服务器按智能体编码一次，发给所有选择 Opus 的前端。
+编码使用 PyAV 自带的 libopus（离线可用）。
+
+Opus 帧的 media_data 为若干个 Opus 包:
+    [packet_len: uint16 big-endian][packet] [packet_len][packet] ...
+
+事件字段中 format 为 "opus"，sample_rate / channels 为解码参数（采样率固定为 48000）。
+
+编码器按句子维护状态：format 为 "wav" 的帧开始新的一句（WAV 头给出采样率和声道数），
+"pcm" 续帧沿用当前参数。Opus 每 20 ms 为一帧，不足一帧的余量留到下一个块，
+句末（is_last）时补零输出；没有 is_last 的句子（如被打断）在下一句开始时丢弃余量，
+不会混入下一句的音频。
+"""
+from typing import Optional
+
+import struct
+
+import numpy as np
+
+OPUS_SAMPLE_RATE = 48000
+PACKET_LEN = struct.Struct(">H")
+
+def parse_wav(wav_data: bytes) -> Optional[tuple[int, int, int, int]]:
+    """
+    Returns:
+        tuple[int, int, int, int] | None: (data chunk 偏移, 采样率, 声道数, 位深)；不是 PCM WAV 时返回 None
+    """
+    if len(wav_data) < 12 or wav_data[:4] != b"RIFF" or wav_data[8:12] != b"WAVE":
+        return None
+
+    params = None
+    pos = 12
+    while pos + 8 <= len(wav_data):
+        chunk_id = bytes(wav_data[pos:pos + 4])
+        (chunk_size,) = struct.unpack_from("<I", wav_data, pos + 4)
+        if chunk_id == b"fmt " and pos + 24 <= len(wav_data):
+            audio_format, channels, sample_rate = struct.unpack_from("<HHI", wav_data, pos + 8)
+            (bits_per_sample,) = struct.unpack_from("<H", wav_data, pos + 22)
+            if audio_format != 1:
+                return None
+            params = (sample_rate, channels, bits_per_sample)
+        elif chunk_id == b"data":
+            return (pos + 8, *params) if params else None
+        pos += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+class OpusStreamEncoder:
+    """
+    Encode the say_aloud audio of one agent to Opus, keeping encoder state across the chunks of a sentence.
+
+    Args:
+        bitrate (int): Target bitrate in bits per second.
+    """
+    def __init__(self, bitrate: int = 24000):
+        import av # 只有服务器需要编码
+
+        self._av = av
+        self.bitrate = bitrate
+        self._encoder = None
+        self._resampler = None
+        self._params: Optional[tuple[int, int, int]] = None # 当前句子的 (采样率, 声道数, 位深)
+
+        # metrics
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+    def _open(self, channels: int):
+        encoder = self._av.CodecContext.create("libopus", "w")
+        encoder.sample_rate = OPUS_SAMPLE_RATE
+        encoder.layout = "stereo" if channels == 2 else "mono"
+        encoder.format = "s16"
+        encoder.bit_rate = self.bitrate
+        encoder.options = {"application": "voip"}
+        encoder.open()
+        self._encoder = encoder
+        self._new_resampler()
+
+    def _new_resampler(self):
+        # 重采样到 48 kHz，并按编码器的帧长（20 ms）重新分帧
+        self._resampler = self._av.AudioResampler(
+            format="s16",
+            layout=self._encoder.layout,
+            rate=OPUS_SAMPLE_RATE,
+            frame_size=self._encoder.frame_size,
+        )
+
+    def _encode_frames(self, frames) -> list[bytes]:
+        packets = []
+        for frame in frames:
+            packets.extend(bytes(packet) for packet in self._encoder.encode(frame))
+        return packets
+
+    def _drop_sentence(self):
+        """丢弃当前句子未输出的余量"""
+        self._new_resampler()
+
+    def _flush_sentence(self) -> list[bytes]:
+        """输出当前句子不足一帧的余量（补零）"""
+        if self._resampler is None:
+            return []
+        frames = []
+        for frame in self._resampler.resample(None):
+            if frame.samples < self._encoder.frame_size:
+                # libopus 只在编码结束时才输出不足一帧的数据，这里补零到整帧
+                samples = frame.to_ndarray()
+                padded = np.zeros((1, self._encoder.frame_size * samples.shape[1] // frame.samples), dtype=np.int16)
+                padded[:, :samples.shape[1]] = samples
+                frame = self._av.AudioFrame.from_ndarray(padded, format="s16", layout=self._encoder.layout)
+                frame.sample_rate = OPUS_SAMPLE_RATE
+            frames.append(frame)
+        packets = self._encode_frames(frames)
+        self._new_resampler()
+        return packets
+
+    def encode(self, header: dict, media_data: bytes) -> Optional[tuple[dict, bytes]]:
+        """
+        Encode one say_aloud frame.
+
+        Returns:
+            tuple[dict, bytes] | None: (新的事件字段, Opus 数据)；无法编码（如 mp3 或缺少流参数）时返回 None
+        """
+        format = header.get("format")
+        packets: list[bytes] = []
+
+        if format == "wav":
+            parsed = parse_wav(media_data)
+            if parsed is None:
+                return None
+            offset, *params = parsed
+            if self._encoder is None or self._params[1] != params[1]:  # type: ignore[index]
+                self._open(params[1])
+            else:
+                self._drop_sentence()
+            self._params = tuple(params)  # type: ignore[assignment]
+            pcm_data = memoryview(media_data)[offset:]
+        elif format == "pcm" and self._params is not None:
+            pcm_data = memoryview(media_data)
+        else:
+            return None
+
+        sample_rate, channels, bits_per_sample = self._params  # type: ignore[misc]
+        if bits_per_sample != 16:
+            return None
+
+        samples = len(pcm_data) // (2 * channels)
+        if samples:
+            pcm_samples = np.frombuffer(pcm_data, dtype=np.int16, count=samples * channels)
+            frame = self._av.AudioFrame.from_ndarray(pcm_samples.reshape(1, -1), format="s16", layout=self._encoder.layout)
+            frame.sample_rate = sample_rate
+            packets += self._encode_frames(self._resampler.resample(frame))
+        if header.get("is_last"):
+            packets += self._flush_sentence()
+
+        opus_data = b"".join(PACKET_LEN.pack(len(packet)) + packet for packet in packets)
+        self.input_bytes += len(media_data)
+        self.output_bytes += len(opus_data)
+        return {**header, "format": "opus", "sample_rate": OPUS_SAMPLE_RATE, "channels": channels}, opus_data
+
+def split_opus_packets(opus_data: bytes) -> list[bytes]:
+    """将 Opus 帧的 media_data 拆分为 Opus 包"""
+    packets = []
+    pos = 0
+    while pos + PACKET_LEN.size <= len(opus_data):
+        (size,) = PACKET_LEN.unpack_from(opus_data, pos)
+        packets.append(opus_data[pos + PACKET_LEN.size:pos + PACKET_LEN.size + size])
+        pos += PACKET_LEN.size + size
+    return packets
@@ -0,0 +1,56 @@
+"""
+Binary audio frame
+
+用 WebSocket 二进制帧直接传输音频，避免 base64 带来的 33% 体积膨胀和编解码开销。
+
+帧格式:
+    [header_len: uint32 big-endian][header: UTF-8 JSON][media_data: raw bytes]
+
+header 为 say_aloud 事件中除 media_data 以外的字段，例如:
+    {"type": "say_aloud", "content": "显示文本", "format": "wav", "seq": 1, "is_last": true}
+"""
+import base64
+import json
+import struct
+
+HEADER_LEN = struct.Struct(">I")
+
+def pack_audio_frame(header: dict, media_data: bytes) -> bytes:
+    """
+    将事件元数据与音频数据打包为二进制帧
+
+    Args:
+        header (dict): 事件元数据（不含 media_data）
+        media_data (bytes): 原始音频数据
+
+    Returns:
+        bytes: 二进制帧
+    """
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    return b"".join((HEADER_LEN.pack(len(header_bytes)), header_bytes, media_data))
+
+def unpack_audio_frame(frame: bytes) -> tuple[dict, memoryview]:
+    """
+    解析二进制帧
+
+    Returns:
+        tuple[dict, memoryview]: (事件元数据, 音频数据的零拷贝视图)
+    """
+    view = memoryview(frame)
+    if len(view) < HEADER_LEN.size:
+        raise ValueError("audio frame too short")
+    (header_len,) = HEADER_LEN.unpack_from(view)
+    header_end = HEADER_LEN.size + header_len
+    if len(view) < header_end:
+        raise ValueError("audio frame header truncated")
+    header = json.loads(bytes(view[HEADER_LEN.size:header_end]))
+    if type(header) is not dict:
+        raise ValueError("audio frame header must be a JSON object")
+    return header, view[header_end:]
+
+def audio_frame_to_event(frame: bytes) -> dict:
+    """
+    将二进制帧转换为旧版 JSON 事件（media_data 为 base64 字符串），供不支持二进制帧的前端使用
+    """
+    header, media_data = unpack_audio_frame(frame)
+    return {**header, "media_data": base64.b64encode(media_data).decode("utf-8")}
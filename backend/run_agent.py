@@ -20,7 +20,15 @@ parser.add_argument("--ppt-images-dir", default=None, help="ppt images directory
 parser.add_argument("--ppt-base-url", default="/documents/slides", help="ppt assets base url on server")
 parser.add_argument("--tts-stream", action="store_true", help="enable tts stream")
 parser.add_argument("--no-tts-stream", action="store_true", help="disable tts stream")
+parser.add_argument("--tts-incremental", action="store_true", help="feed llm output into one tts session per response (dashscope only)")
+parser.add_argument("--concurrent-pipeline", action="store_true", help="run each stream node (sentence split, brackets parse, emit) as its own task")
+parser.add_argument("--pipeline-metrics", type=float, default=0, metavar="SECONDS", help="print stream node metrics every SECONDS seconds, 0 to disable")
 parser.add_argument("--no-auto-start", action="store_true", help="disable auto start for lecture_agent")
+parser.add_argument("--audio-pack", default=None, help="pre-rendered audio pack directory for lecture_agent (default: <script>_audio)")
+parser.add_argument("--build-audio-pack", action="store_true", help="render the lecture script into the audio pack and exit")
+parser.add_argument("--tts-cache-size", type=int, default=64, help="in-memory tts cache size in MB, 0 to disable")
+parser.add_argument("--tts-cache-dir", default=None, help="on-disk tts cache directory")
+parser.add_argument("--binary-audio", action="store_true", help="send audio as binary websocket frames instead of base64 json")
 
 args = parser.parse_args()
 
@@ -46,7 +54,9 @@ llm_api_config = LLM_Config(
 tts_config = Dashscope_TTS_Config(
     api_key = get_token('dashscope'),
     voice = "qwen-tts-vc-shumeiniang-voice-20260213105602228-e984",
-    model = "qwen3-tts-vc-realtime-2026-01-15"
+    model = "qwen3-tts-vc-realtime-2026-01-15",
+    cache_max_bytes = args.tts_cache_size * 1024 * 1024,
+    cache_dir = args.tts_cache_dir
 )
 tts_stream = True
 if args.no_tts_stream:
@@ -54,27 +64,40 @@ if args.no_tts_stream:
 elif args.tts_stream:
     tts_stream = True
 
-if args.agent_type == "lecture_agent":
-    agent = create_agent(
-        agent_type = "lecture_agent",
-        server_url = server_url,
-        agent_name = agent_name,
-        llm_api_config = None,
-        tts_config = tts_config,
-        tts_stream = tts_stream,
-        lecture_script_path = args.lecture_script,
-        ppt_images_dir = args.ppt_images_dir,
-        ppt_base_url = args.ppt_base_url,
-        auto_start = not args.no_auto_start,
-    )
-else:
-    agent_config = AgentConfig(
-        server_url = server_url,
-        agent_name = agent_name,
-        llm_api_config = llm_api_config,
-        tts_config = tts_config,
-        tts_stream = tts_stream,
-    )
-    agent = create_agent(agent_type = 'basic_chatting_agent', **agent_config.model_dump())
+# NOTE: Genie TTS 的工作进程以 spawn 方式启动，会重新导入本模块，创建智能体的代码必须放在 main 保护中
+if __name__ == "__main__":
+    if args.agent_type == "lecture_agent":
+        agent = create_agent(
+            agent_type = "lecture_agent",
+            server_url = server_url,
+            agent_name = agent_name,
+            llm_api_config = None,
+            tts_config = tts_config,
+            tts_stream = tts_stream,
+            lecture_script_path = args.lecture_script,
+            ppt_images_dir = args.ppt_images_dir,
+            ppt_base_url = args.ppt_base_url,
+            auto_start = not args.no_auto_start,
+            binary_audio = args.binary_audio,
+            audio_pack_dir = args.audio_pack,
+            concurrent_pipeline = args.concurrent_pipeline,
+            pipeline_metrics_interval = args.pipeline_metrics,
+        )
+        if args.build_audio_pack:
+            asyncio.run(agent.build_audio_pack())
+            sys.exit(0)
+    else:
+        agent_config = AgentConfig(
+            server_url = server_url,
+            agent_name = agent_name,
+            llm_api_config = llm_api_config,
+            tts_config = tts_config,
+            tts_stream = tts_stream,
+            tts_incremental = args.tts_incremental,
+            concurrent_pipeline = args.concurrent_pipeline,
+            pipeline_metrics_interval = args.pipeline_metrics,
+            binary_audio = args.binary_audio,
+        )
+        agent = create_agent(agent_type = 'basic_chatting_agent', **agent_config.model_dump())
 
-asyncio.run(agent.run())
+    asyncio.run(agent.run())
@@ -3,14 +3,19 @@ A server for communication between frontend and agents (or between agents)
 
 提供以下接口：
     - /ws/agent: 智能体连接此端口
-    - /ws/frontend: 前端连接此端口
+    - /ws/frontend: 前端连接此端口（?binary=1 表示前端支持二进制音频帧，见 protocol/audio_frame.py；
+      ?codec=opus 表示接收 Opus 压缩音频，见 protocol/audio_codec.py）
 """
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
+from collections import deque
+from typing import Literal
 
+import asyncio
+import base64
 import json
 import uvicorn
 import logging
@@ -18,6 +23,8 @@ import uuid
 import argparse
 import os
 
+from protocol import pack_audio_frame, unpack_audio_frame, OpusStreamEncoder
+
 # 配置logging
 logging.basicConfig(
     level=logging.INFO,
@@ -39,14 +46,111 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# "unbounded": 不丢弃也不断开，队列超过 max_size 时记录警告（用于发给智能体的控制事件）
+OverflowPolicy = Literal["drop_oldest", "drop_non_audio", "disconnect", "unbounded"]
+
+# 单个客户端的发送队列 - 每个连接一个有界队列 + 一个写协程，慢客户端不会拖慢其他客户端
+class ClientSender:
+    def __init__(self, manager: 'ConnectionManager', client_id: str, websocket: WebSocket,
+                 max_size: int = 256, overflow_policy: OverflowPolicy = "drop_oldest"):
+        self.manager = manager
+        self.client_id = client_id
+        self.websocket = websocket
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+
+        # 队列元素：(message, is_audio)，bytes 消息以二进制帧发送
+        self._queue: deque[tuple[str | bytes, bool]] = deque()
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self.dropped = 0
+        self._over_high_water = False
+
+        self._task = asyncio.create_task(self._writer())
+
+    def enqueue(self, message: str | bytes, is_audio: bool = False) -> bool:
+        """
+        将消息放入发送队列（不等待网络发送）
+
+        Returns:
+            bool: False 表示队列溢出且策略为 "disconnect"，调用方应断开该客户端
+        """
+        if self._closed:
+            return True
+
+        if self.overflow_policy == "unbounded":
+            if len(self._queue) >= self.max_size and not self._over_high_water:
+                self._over_high_water = True
+                logger.warning(f"[{self.manager.name} manager] send queue of {self.client_id} exceeds {self.max_size} messages")
+            elif len(self._queue) < self.max_size // 2:
+                self._over_high_water = False
+        elif len(self._queue) >= self.max_size:
+            if self.overflow_policy == "disconnect":
+                return False
+
+            if self.overflow_policy == "drop_non_audio":
+                if not is_audio:
+                    # 丢弃新到达的非音频消息
+                    self._record_drop("new non-audio message")
+                    return True
+                # 优先丢弃最早的非音频消息，若队列中全是音频则丢弃最早的一条
+                for i, (_, queued_is_audio) in enumerate(self._queue):
+                    if not queued_is_audio:
+                        del self._queue[i]
+                        break
+                else:
+                    self._queue.popleft()
+            else: # drop_oldest
+                self._queue.popleft()
+            self._record_drop("oldest queued message")
+
+        self._queue.append((message, is_audio))
+        self._wakeup.set()
+        return True
+
+    def _record_drop(self, what: str):
+        self.dropped += 1
+        logger.warning(f"[{self.manager.name} manager] send queue of {self.client_id} is full, dropped {what} (total dropped: {self.dropped})")
+
+    async def _writer(self):
+        while True:
+            while not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            message, _ = self._queue.popleft()
+            try:
+                if type(message) is bytes:
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(message)
+            except Exception as e:
+                logger.info(f"发送消息到客户端 {self.client_id} 失败: {e}")
+                await self.manager.disconnect(self.client_id)
+                return
+
+    def close(self):
+        """停止写协程，丢弃未发送的消息"""
+        self._closed = True
+        self._queue.clear()
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
 # 连接管理器 - 智能体和前端分别使用
 class ConnectionManager:
-    def __init__(self, name: str = "default"):
+    def __init__(self, name: str = "default", max_queue_size: int = 256, overflow_policy: OverflowPolicy = "drop_oldest"):
         # 存储活跃连接：client_id -> WebSocket
         self.active_connections: dict[str, WebSocket] = {}
+        # 存储发送队列：client_id -> ClientSender
+        self.senders: dict[str, ClientSender] = {}
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
         # 存储用户信息：client_id -> user_info
         self.users: dict[str, dict] = {}
+        # 路由索引：agent_name -> {client_id}，在 connect / disconnect 时维护
+        self.agent_index: dict[str, set[str]] = {}
         self.name = name
+        self._background_tasks: set[asyncio.Task] = set()
     
     def log(self, message: str):
         """记录日志"""
@@ -61,12 +165,14 @@ class ConnectionManager:
         
         # 存储连接和用户信息
         self.active_connections[client_id] = websocket
+        self.senders[client_id] = ClientSender(self, client_id, websocket, self.max_queue_size, self.overflow_policy)
         self.users[client_id] = {
             "client_id": client_id,
             "agent_name": user_data.get("agent_name", ""),
             "join_time": datetime.now().isoformat(),
             **user_data  # 包含其他用户数据
         }
+        self.agent_index.setdefault(self.users[client_id]["agent_name"], set()).add(client_id)
         
         self.log(f"Connected! agent_name: {user_data.get('agent_name')}, client_id: {client_id}")
         
@@ -85,39 +191,56 @@ class ConnectionManager:
         if client_id in self.active_connections:
             # 移除连接
             del self.active_connections[client_id]
-            del self.users[client_id]
+            self.senders.pop(client_id).close()
+            user_info = self.users.pop(client_id)
+
+            # 更新路由索引
+            agent_name = user_info.get("agent_name", "")
+            client_ids = self.agent_index.get(agent_name)
+            if client_ids is not None:
+                client_ids.discard(client_id)
+                if not client_ids:
+                    del self.agent_index[agent_name]
+
+    async def send_personal_message(self, message: str | bytes, client_id: str, is_audio: bool = False):
+        """向特定客户端发送消息（放入该客户端的发送队列后立即返回）"""
+        sender = self.senders.get(client_id)
+        if sender and not sender.enqueue(message, is_audio):
+            await self.kick(client_id, "send queue overflow")
+
+    async def broadcast(self, message: str | bytes, exclude_client_id: str = None, is_audio: bool = False):
+        """广播消息给所有客户端"""
+        overflowed_clients = [
+            client_id for client_id, sender in self.senders.items()
+            if client_id != exclude_client_id and not sender.enqueue(message, is_audio)
+        ]
 
-    async def send_personal_message(self, message: str, client_id: str):
-        """向特定客户端发送消息"""
-        if client_id in self.active_connections:
+        # 清理发送队列溢出的客户端
+        for client_id in overflowed_clients:
+            await self.kick(client_id, "send queue overflow")
+
+    async def kick(self, client_id: str, reason: str):
+        """主动断开客户端（关闭 WebSocket 不阻塞调用方）"""
+        websocket = self.active_connections.get(client_id)
+        if websocket is None:
+            return
+        self.log(f"Kicked client {client_id}: {reason}")
+        await self.disconnect(client_id)
+
+        async def close_websocket():
             try:
-                await self.active_connections[client_id].send_text(message)
-            except Exception as e:
-                logging.info(f"发送消息到客户端 {client_id} 失败: {e}")
-                await self.disconnect(client_id)
+                await websocket.close(code=1008, reason=reason)
+            except Exception:
+                pass
 
-    async def broadcast(self, message: str, exclude_client_id: str = None):
-        """广播消息给所有客户端"""
-        disconnected_clients = []
-        
-        for client_id, connection in self.active_connections.items():
-            if client_id != exclude_client_id:
-                try:
-                    await connection.send_text(message)
-                except Exception as e:
-                    logging.info(f"广播消息到客户端 {client_id} 失败: {e}")
-                    disconnected_clients.append(client_id)
-        
-        # 清理断开连接的客户端
-        for client_id in disconnected_clients:
-            await self.disconnect(client_id)
+        task = asyncio.create_task(close_websocket())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
     
     def get_client_ids_by_agent_name(self, agent_name: str) -> list[str]:
         """根据智能体名称获取所有连接的客户端ID"""
-        return [
-            client_id for client_id, user_info in self.users.items()
-            if user_info.get("agent_name") == agent_name
-        ]
+        # 返回副本，调用方在遍历过程中可能触发 disconnect
+        return list(self.agent_index.get(agent_name, ()))
 
     def get_online_users(self):
         """获取在线用户列表"""
@@ -131,12 +254,17 @@ class ConnectionManager:
         ]
 
 # 创建连接管理器实例
-agent_manager = ConnectionManager('agent')
+# 发给智能体的是控制事件（用户消息、打断、翻页等），既不能丢弃，也不能因积压断开（智能体不会重连）
+agent_manager = ConnectionManager('agent', overflow_policy="unbounded")
 frontend_manager = ConnectionManager('frontend')
 
 # 存储已连接的智能体
 connected_agents: set[str] = set()
 
+# 音频压缩：每个智能体一个 Opus 编码器（有前端选择 Opus 时才创建），编码结果发给所有选择 Opus 的前端
+opus_bitrate = 24000
+opus_encoders: dict[str, OpusStreamEncoder] = {}
+
 
 def mount_ppt_assets(ppt_images_dir: str | None, mount_path: str = "/documents/slides"):
     if not ppt_images_dir:
@@ -149,6 +277,114 @@ def mount_ppt_assets(ppt_images_dir: str | None, mount_path: str = "/documents/s
     app.mount(mount_path, StaticFiles(directory=ppt_images_dir), name="ppt-assets")
     logger.info(f"Mounted PPT assets: {ppt_images_dir} -> {mount_path}")
 
+# 智能体 emit 的消息通常为 json.dumps({"type": "event", "data": ...}) 的输出
+EVENT_ENVELOPE_PREFIX = '{"type": "event", "data": '
+_json_decoder = json.JSONDecoder()
+AUDIO_EVENT_PREFIX = '{"type": "say_aloud"'
+AUDIO_CODECS = ("opus",)
+
+def split_event_envelope(message: str) -> str | None:
+    """
+    若消息是标准格式的 event，切出 data 部分的原始 JSON 文本，转发时不再重新序列化。
+    data 只解码一次用于校验：必须是合法的 JSON 对象，且其后只剩信封的 "}"（没有其他键）。
+
+    Returns:
+        str | None: data 的原始 JSON 文本；消息不是标准格式（键的顺序不同、有其他键、JSON 不合法）时返回 None，
+            由调用方按普通消息完整解析
+    """
+    if not message.startswith(EVENT_ENVELOPE_PREFIX):
+        return None
+    start = len(EVENT_ENVELOPE_PREFIX)
+    try:
+        event_data, end = _json_decoder.raw_decode(message, start)
+    except json.JSONDecodeError:
+        return None
+    if type(event_data) is not dict or message[end:] != "}":
+        return None
+    return message[start:end]
+
+def make_event_frame(raw_event_data: str) -> str:
+    """用 data 的原始 JSON 文本构造转发帧，每个事件只构造一次"""
+    return f'{{"time": "{datetime.now().isoformat()}", "data": {raw_event_data}}}'
+
+def wants_opus(frontend_ids: list[str]) -> bool:
+    return any(frontend_manager.users.get(frontend_id, {}).get("audio_codec") == "opus" for frontend_id in frontend_ids)
+
+async def relay_agent_event(client_id: str, raw_event_data: str) -> dict:
+    """将智能体事件（data 的原始 JSON 文本）转发给订阅该智能体的所有前端"""
+    is_audio = raw_event_data.startswith(AUDIO_EVENT_PREFIX)
+    agent_name = agent_manager.users.get(client_id, {}).get("agent_name", "")
+    frontend_ids = frontend_manager.get_client_ids_by_agent_name(agent_name)
+
+    if is_audio and wants_opus(frontend_ids):
+        # 需要压缩时才解析音频事件
+        event_data = json.loads(raw_event_data)
+        media_data = base64.b64decode(event_data.pop("media_data", ""))
+        return await relay_audio(agent_name, frontend_ids, event_data, media_data, legacy_frame=make_event_frame(raw_event_data))
+
+    frame = make_event_frame(raw_event_data)
+    for frontend_id in frontend_ids:
+        await frontend_manager.send_personal_message(frame, frontend_id, is_audio=is_audio)
+    return {"type": "success", "message": "event sent"}
+
+async def relay_agent_audio(client_id: str, frame: bytes) -> dict:
+    """将智能体的二进制音频帧转发给前端"""
+    try:
+        header, media_data = unpack_audio_frame(frame)
+    except ValueError as e:
+        return {"type": "error", "message": f"invalid audio frame: {e}"}
+
+    agent_name = agent_manager.users.get(client_id, {}).get("agent_name", "")
+    frontend_ids = frontend_manager.get_client_ids_by_agent_name(agent_name)
+    return await relay_audio(agent_name, frontend_ids, header, media_data, binary_frame=frame)
+
+async def relay_audio(agent_name: str, frontend_ids: list[str], header: dict, media_data: bytes,
+                      binary_frame: bytes | None = None, legacy_frame: str | None = None) -> dict:
+    """
+    按前端协商的传输方式转发 say_aloud 音频，每种形式只构造一次：
+    - 选择 Opus 的前端收到压缩后的音频（编码器无法处理的格式照常发送原始音频）
+    - 支持二进制帧的前端收到二进制帧，其余前端收到等价的 JSON 事件（base64）
+    Opus 编码器的状态跨越一句话的所有音频块，前端从句首（"wav" 帧）开始才接收 Opus，
+    在一句话中途连接的前端先收到原始音频，直到下一句开始。
+    """
+    opus = None
+    if wants_opus(frontend_ids):
+        if agent_name not in opus_encoders:
+            opus_encoders[agent_name] = OpusStreamEncoder(opus_bitrate)
+        # 编码在线程中进行，不阻塞其他连接的收发
+        opus = await asyncio.to_thread(opus_encoders[agent_name].encode, header, media_data)
+
+    # (是否 Opus, 是否二进制) -> 消息
+    messages: dict[tuple[bool, bool], str | bytes] = {}
+
+    def build_message(use_opus: bool, binary: bool) -> str | bytes:
+        if use_opus:
+            frame_header, frame_data = opus  # type: ignore[misc]
+        else:
+            frame_header, frame_data = header, media_data
+            if binary and binary_frame is not None:
+                return binary_frame
+            if not binary and legacy_frame is not None:
+                return legacy_frame
+        if binary:
+            return pack_audio_frame(frame_header, frame_data)
+        return make_event_frame(json.dumps({**frame_header, "media_data": base64.b64encode(frame_data).decode("utf-8")}))
+
+    starts_utterance = header.get("format") == "wav"
+    for frontend_id in frontend_ids:
+        user_info = frontend_manager.users.get(frontend_id, {})
+        use_opus = opus is not None and user_info.get("audio_codec") == "opus"
+        if use_opus:
+            if starts_utterance:
+                user_info["opus_stream"] = agent_name
+            elif user_info.get("opus_stream") != agent_name:
+                use_opus = False
+        key = (use_opus, bool(user_info.get("binary_audio")))
+        if key not in messages:
+            messages[key] = build_message(*key)
+        await frontend_manager.send_personal_message(messages[key], frontend_id, is_audio=True)
+    return {"type": "success", "message": "event sent"}
+
 async def handle_agent_message(client_id: str, message_data: dict) -> dict | None:
     """处理智能体发送的消息"""
     # logging.info(f"智能体 {client_id} 发送消息: {message_data}") # DEBUG
@@ -165,10 +401,7 @@ async def handle_agent_message(client_id: str, message_data: dict) -> dict | Non
     elif message_type == "event":
         # 向前端发送事件
         event_data = message_data.get("data", "")
-        agent_name = agent_manager.users.get(client_id, {}).get("agent_name", "")
-        for client_id in frontend_manager.get_client_ids_by_agent_name(agent_name):
-            await frontend_manager.send_personal_message(json.dumps({"time": datetime.now().isoformat(), "data": event_data}), client_id)
-        return {"type": "success", "message": "event sent"}
+        return await relay_agent_event(client_id, json.dumps(event_data))
 
 async def handle_frontend_message(client_id: str, message_data: dict) -> dict | None:
     """处理前端发送的消息"""
@@ -194,10 +427,11 @@ async def handle_frontend_message(client_id: str, message_data: dict) -> dict |
     elif message_type == "event":
         # 向智能体发送事件
         event_data = message_data.get("data", {})
+        frame = make_event_frame(json.dumps(event_data))
         agent_name = frontend_manager.users.get(client_id, {}).get("agent_name", "")
         for client_id in agent_manager.get_client_ids_by_agent_name(agent_name):
             # logging.info(f"向智能体 {agent_name} 发送事件: {event_data}") # DEBUG
-            await agent_manager.send_personal_message(json.dumps({"time": datetime.now().isoformat(), "data": event_data}), client_id)
+            await agent_manager.send_personal_message(frame, client_id)
         return {"type": "success", "message": "event sent"}
 
 # 智能体 WebSocket 端点
@@ -222,30 +456,48 @@ async def ws_agent(websocket: WebSocket, agent_name: str):
     try:
         while True:
             # 接收客户端消息
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
-            
-            # 处理不同类型的消息
-            res = await handle_agent_message(client_id, message_data)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes") is not None:
+                # 二进制音频帧
+                res = await relay_agent_audio(client_id, message["bytes"])
+            else:
+                data = message["text"]
+
+                # 快速路径：标准 event 直接转发原始 data 文本
+                raw_event_data = split_event_envelope(data)
+                if raw_event_data is not None:
+                    res = await relay_agent_event(client_id, raw_event_data)
+                else:
+                    message_data = json.loads(data)
+
+                    # 处理不同类型的消息
+                    res = await handle_agent_message(client_id, message_data)
             if res:
                 await agent_manager.send_personal_message(json.dumps(res), client_id)
             
     except WebSocketDisconnect:
         connected_agents.remove(agent_name)
+        opus_encoders.pop(agent_name, None)
         await agent_manager.disconnect(client_id)
     except Exception as e:
         logging.error(f"WebSocket error encountered: {e}")
         connected_agents.remove(agent_name)
+        opus_encoders.pop(agent_name, None)
         await agent_manager.disconnect(client_id)
 
 # 前端 WebSocket 端点
 @app.websocket("/ws/frontend/{agent_name}")
-async def ws_frontend(websocket: WebSocket, agent_name: str):
+async def ws_frontend(websocket: WebSocket, agent_name: str, binary: bool = False, codec: str = ""):
     """前端 WebSocket 端点"""
     # 准备用户数据
     user_data = {
         "agent_name": agent_name,
-        "connect_time": datetime.now().isoformat()
+        "connect_time": datetime.now().isoformat(),
+        "binary_audio": binary, # 是否接收二进制音频帧
+        "audio_codec": codec if codec in AUDIO_CODECS else "", # 音频压缩格式，空为不压缩
     }
     
     client_id = await frontend_manager.connect(websocket, user_data)
@@ -273,9 +525,16 @@ if __name__ == "__main__":
     parser.add_argument("--port", type=int, default=8000, help="server port, defaults to 8000")
     parser.add_argument("--ppt-images-dir", default=None, help="static dir for ppt images")
     parser.add_argument("--ppt-mount-path", default="/documents/slides", help="mount path for ppt images")
+    parser.add_argument("--send-queue-size", type=int, default=256, help="max queued outbound messages per frontend")
+    parser.add_argument("--overflow-policy", default="drop_oldest", choices=["drop_oldest", "drop_non_audio", "disconnect"], help="what to do when a frontend's send queue is full")
+    parser.add_argument("--opus-bitrate", type=int, default=24000, help="bitrate (bps) of the opus audio sent to frontends connected with ?codec=opus")
     args = parser.parse_args()
 
     port = args.port
+    opus_bitrate = args.opus_bitrate
+
+    frontend_manager.max_queue_size = args.send_queue_size
+    frontend_manager.overflow_policy = args.overflow_policy
 
     mount_ppt_assets(args.ppt_images_dir, args.ppt_mount_path)
 
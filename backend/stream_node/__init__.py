@@ -1,7 +1,9 @@
 """
 asyncio stream nodes
 """
+from .absctract_stream_node import StreamNode, ControlMessage, END_OF_STREAM, INTERRUPT
 from .lambda_node import LambdaNode
 from .sentence_sep_node import SentenceSepNode
 from .accumulative_list_node import AccumulativeListNode
-from .brackets_parsor_node import BracketsParsorNode
\ No newline at end of file
+from .brackets_parsor_node import BracketsParsorNode
+from .stream_graph import StreamGraph
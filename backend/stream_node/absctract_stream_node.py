@@ -2,25 +2,132 @@
 Abstract stream node
 """
 from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+import time
+
+from .node_metrics import NodeMetrics, count_items
+
+class ControlMessage:
+    """
+    Control message handled by StreamNode.handle itself: never passed to `process`,
+    it runs the lifecycle hook of the node and is then forwarded to the next nodes.
+    """
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return f"<{self.name}>"
+
+END_OF_STREAM = ControlMessage("end_of_stream") # 本轮输入结束：各节点依次输出缓冲的内容
+INTERRUPT = ControlMessage("interrupt") # 打断：各节点立即丢弃缓冲的内容
 
 class StreamNode(ABC):
     def __init__(self):
         self.next_nodes: list['StreamNode'] = []
         self.extract: bool = True
+        self.name: str = type(self).__name__
+        self.metrics: Optional[NodeMetrics] = None # enable_metrics() 后记录
+        self.upstream_count: int = 0 # connect_to 建立的上游连接数
+        self._end_of_stream_received = 0
 
     @abstractmethod
     async def process(self, data):
         pass
 
+    # lifecycle hooks
+
+    def drain(self) -> Any:
+        """
+        Take the buffered output that should be emitted at the end of stream (None if nothing).
+        Nodes that buffer input (e.g. unfinished sentences) override this.
+        """
+        return None
+
+    async def on_end_of_stream(self):
+        """
+        Called at the end of stream, after the output of `drain` has been handled by the next nodes
+        """
+        pass
+
+    def reset(self):
+        """
+        Drop the buffered state, called when the stream is interrupted.
+        """
+        pass
+
+    # metrics
+
+    def enable_metrics(self):
+        if self.metrics is None:
+            self.metrics = NodeMetrics(self.name)
+
+    async def _process(self, data):
+        if self.metrics is None:
+            return await self.process(data)
+        start = time.perf_counter()
+        self.metrics.record_input(start)
+        result = await self.process(data)
+        self.metrics.record_process(start, time.perf_counter(), count_items(result), is_sink=not self.next_nodes)
+        return result
+
+    def _drain(self):
+        remaining = self.drain()
+        if self.metrics is not None:
+            if remaining is not None:
+                self.metrics.record_output(time.perf_counter(), count_items(remaining))
+            self.metrics.end_response()
+        return remaining
+
+    # control
+
+    def _end_of_stream_complete(self) -> bool:
+        """有多个上游时，最后一个上游的 END_OF_STREAM 到达才算结束"""
+        self._end_of_stream_received += 1
+        if self._end_of_stream_received < max(1, self.upstream_count):
+            return False
+        self._end_of_stream_received = 0
+        return True
+
+    async def flush(self):
+        """
+        End the stream: every node from here on emits its buffered output, in order
+        """
+        await self.handle(END_OF_STREAM)
+
+    def interrupt(self):
+        """
+        Reset this node and every node after it, without waiting for the data being processed
+        """
+        self.reset()
+        self._end_of_stream_received = 0
+        if self.metrics is not None:
+            self.metrics.end_response()
+        for next_node in self.next_nodes:
+            next_node.interrupt()
+
+    async def _emit(self, result):
+        for next_node in self.next_nodes:
+            await next_node.handle(result)
+
     async def handle(self, data):
-        if self.extract and type(data) is list:
+        if data is END_OF_STREAM:
+            if not self._end_of_stream_complete():
+                return
+            remaining = self._drain()
+            if remaining is not None:
+                await self._emit(remaining)
+            await self.on_end_of_stream()
+            await self._emit(END_OF_STREAM)
+        elif data is INTERRUPT:
+            self.interrupt()
+        elif self.extract and type(data) is list:
             for d in data:
                 await self.handle(d)
         else:
-            result = await self.process(data)
-            if self.next_nodes:
-                for next_node in self.next_nodes:
-                    await next_node.handle(result)
+            result = await self._process(data)
+            await self._emit(result)
 
     def connect_to(self, next_node: 'StreamNode'):
         self.next_nodes.append(next_node)
+        next_node.upstream_count += 1
@@ -5,24 +5,56 @@ Brackets parsor node
 import re
 from .absctract_stream_node import StreamNode
 
+# 完整的 [tag]，或者一个（可能尚未闭合的）左括号
+TAG_PATTERN = re.compile(r'\[(.*?)\]|\[')
+
 class BracketsParsorNode(StreamNode):
-    def __init__(self):
+    """
+    Split text into text / tag items, e.g. "你好[点头]" -> {"type": "text", "content": "你好"}, {"type": "tag", "content": "点头"}
+
+    A bracket still open at the end of the input is carried over to the next call,
+    so a tag split across two inputs is still recognized and never reaches TTS as text.
+    Brackets that can no longer be closed (a newline follows, or longer than `max_tag_length`) are kept as text.
+    """
+    def __init__(self, max_tag_length: int = 64):
         super().__init__()
-    
-    async def process(self, data: str):
-        split = re.split(r'\[.*?\]', data)
-        tags = re.findall(r'\[(.*?)\]', data)
+        self.max_tag_length = max_tag_length
+        self.buffer = "" # 尚未闭合的 "[..."
 
-        # NOTE: len(tags) == len(split) - 1
+    def reset(self):
+        self.buffer = ""
+
+    async def process(self, data: str):
+        text = self.buffer + data
+        self.buffer = ""
 
         results = []
+        start = 0 # 下一段文本的起始位置
+        end = len(text)
+
+        for match in TAG_PATTERN.finditer(text):
+            tag = match.group(1)
+            if tag is None:
+                # 没有闭合的左括号
+                if text.find("\n", match.start()) != -1 or end - match.start() > self.max_tag_length:
+                    continue # 不可能再闭合，按普通文本处理
+                self.buffer = text[match.start():]
+                end = match.start()
+                break
 
-        for i in range(len(split)):
+            if match.start() > start:
+                results.append({"type": "text", "content": text[start:match.start()]})
+            results.append({"type": "tag", "content": tag})
+            start = match.end()
 
-            if split[i] != "":
-                results.append({"type": "text", "content": split[i]})
+        if end > start:
+            results.append({"type": "text", "content": text[start:end]})
+        return results
 
-            if i < len(tags):
-                results.append({"type": "tag", "content": tags[i]})
-        
-        return results
\ No newline at end of file
+    def drain(self) -> dict | None:
+        """将尚未闭合的括号作为文本输出"""
+        if not self.buffer:
+            return None
+        remaining = self.buffer
+        self.buffer = ""
+        return {"type": "text", "content": remaining}
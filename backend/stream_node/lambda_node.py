@@ -1,18 +1,43 @@
 """
 Lambda node
 """
-from typing import Callable, Any
+from typing import Callable, Any, Optional
 from .absctract_stream_node import StreamNode
 
 import asyncio
 
 class LambdaNode(StreamNode):
-    def __init__(self, func: Callable[['StreamNode', Any], Any]):
+    """
+    Args:
+        func: Called with (node, data) for every item.
+        on_end_of_stream: Optional, called with (node) at the end of stream.
+        on_interrupt: Optional, called with (node) when the stream is interrupted.
+    """
+    def __init__(
+        self,
+        func: Callable[['StreamNode', Any], Any],
+        on_end_of_stream: Optional[Callable[['StreamNode'], Any]] = None,
+        on_interrupt: Optional[Callable[['StreamNode'], Any]] = None,
+    ):
         super().__init__()
         self.func = func
+        self.end_of_stream_func = on_end_of_stream
+        self.interrupt_func = on_interrupt
 
     async def process(self, data):
         if asyncio.iscoroutinefunction(self.func):
             return await self.func(self, data)
         else:
-            return self.func(self, data)
\ No newline at end of file
+            return self.func(self, data)
+
+    async def on_end_of_stream(self):
+        if self.end_of_stream_func is None:
+            return
+        if asyncio.iscoroutinefunction(self.end_of_stream_func):
+            await self.end_of_stream_func(self)
+        else:
+            self.end_of_stream_func(self)
+
+    def reset(self):
+        if self.interrupt_func is not None:
+            self.interrupt_func(self)
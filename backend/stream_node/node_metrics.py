@@ -0,0 +1,99 @@
+"""
+Node metrics: opt-in instrumentation of stream nodes
+
+StreamNode.enable_metrics() / StreamGraph.enable_metrics() 开启后记录：
+- items_in / items_out: 输入、输出的数据项数（列表按元素计）
+- process_time: process 的耗时
+- queue_wait: 数据在节点输入队列中的等待时间（仅 StreamGraph concurrent 模式）
+- time_to_first_output: 每轮（END_OF_STREAM / INTERRUPT 之间）从节点收到第一个输入到产生第一个输出的时间，
+  没有下游的节点（如发送事件的 LambdaNode）以第一次 process 完成为输出
+"""
+from typing import Any, Optional
+
+def count_items(data: Any) -> int:
+    if data is None:
+        return 0
+    if type(data) is list:
+        return len(data)
+    return 1
+
+class NodeMetrics:
+    def __init__(self, name: str):
+        self.name = name
+
+        # metrics
+        self.items_in = 0
+        self.items_out = 0
+        self.processed = 0
+        self.total_process_time = 0.0
+        self.max_process_time = 0.0
+        self.queued = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.responses = 0
+        self.total_first_output = 0.0
+        self.max_first_output = 0.0
+        self.last_first_output: Optional[float] = None
+
+        # 当前一轮：第一个输入的时间，产生第一个输出后置为 None
+        self._response_start: Optional[float] = None
+        self._in_response = False
+
+    def record_input(self, now: float):
+        self.items_in += 1
+        if not self._in_response:
+            self._in_response = True
+            self._response_start = now
+
+    def record_queue_wait(self, wait: float):
+        self.queued += 1
+        self.total_queue_wait += wait
+        self.max_queue_wait = max(self.max_queue_wait, wait)
+
+    def record_process(self, start: float, end: float, outputs: int, is_sink: bool):
+        elapsed = end - start
+        self.processed += 1
+        self.total_process_time += elapsed
+        self.max_process_time = max(self.max_process_time, elapsed)
+        self.record_output(end, outputs, is_sink)
+
+    def record_output(self, now: float, outputs: int, is_sink: bool = False):
+        self.items_out += outputs
+        if self._response_start is not None and (outputs or is_sink):
+            first_output = now - self._response_start
+            self._response_start = None
+            self.responses += 1
+            self.total_first_output += first_output
+            self.max_first_output = max(self.max_first_output, first_output)
+            self.last_first_output = first_output
+
+    def end_response(self):
+        """END_OF_STREAM / INTERRUPT：下一个输入开始新的一轮"""
+        self._in_response = False
+        self._response_start = None
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "node": self.name,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "avg_process_time": self.total_process_time / self.processed if self.processed else 0.0,
+            "max_process_time": self.max_process_time,
+            "total_process_time": self.total_process_time,
+            "avg_queue_wait": self.total_queue_wait / self.queued if self.queued else 0.0,
+            "max_queue_wait": self.max_queue_wait,
+            "responses": self.responses,
+            "avg_time_to_first_output": self.total_first_output / self.responses if self.responses else 0.0,
+            "max_time_to_first_output": self.max_first_output,
+            "last_time_to_first_output": self.last_first_output,
+        }
+
+    def format(self) -> str:
+        """单行摘要，时间单位为毫秒"""
+        s = self.snapshot()
+        return (
+            f"{self.name} in={s['items_in']} out={s['items_out']}"
+            f" process={s['avg_process_time'] * 1000:.1f}/{s['max_process_time'] * 1000:.1f}ms"
+            f" wait={s['avg_queue_wait'] * 1000:.1f}/{s['max_queue_wait'] * 1000:.1f}ms"
+            f" first_output={s['avg_time_to_first_output'] * 1000:.1f}/{s['max_time_to_first_output'] * 1000:.1f}ms"
+        )
@@ -5,34 +5,47 @@ import re
 from .absctract_stream_node import StreamNode
 
 class SentenceSepNode(StreamNode):
+    """
+    Split streamed text into sentences.
+
+    Only the newly received text is scanned; the unfinished sentence is kept as a list of pieces
+    and joined once its separator arrives, so the total cost is linear in the length of the text.
+    """
     def __init__(self, seps: str = ',.:;?!，。：；？！\n', keep_seps: bool = True):
         super().__init__()
         self.seps = seps
         self.keep_seps = keep_seps
-        self.buffer = ""
+        # 分隔符集合只编译一次
+        self._sep_pattern = re.compile(f'[{re.escape(seps)}]')
+        self._pending: list[str] = [] # 尚未结束的句子片段
+
+    @property
+    def buffer(self) -> str:
+        return "".join(self._pending)
 
     def reset(self):
-        self.buffer = ""
+        self._pending = []
 
     async def process(self, data: str):
-        self.buffer += data
-        # 使用正则表达式按照多个分隔符中的任意一个来分割
-        split = re.split(f'[{re.escape(self.seps)}]', self.buffer)
-
-        if self.keep_seps:
-            seps = re.findall(f'[{re.escape(self.seps)}]', self.buffer)
-            sentences = [sentence + sep for sentence, sep in zip(split[:-1], seps)]
-        else:
-            sentences = split[:-1]
+        sentences = []
+        start = 0 # data 中当前句子的起始位置
+        for match in self._sep_pattern.finditer(data):
+            end = match.end() if self.keep_seps else match.start()
+            if self._pending:
+                self._pending.append(data[start:end])
+                sentences.append("".join(self._pending))
+                self._pending = []
+            else:
+                sentences.append(data[start:end])
+            start = match.end()
 
-        self.buffer = split[-1]
+        if start < len(data):
+            self._pending.append(data[start:])
         return sentences
 
-    async def flush(self):
-        if not self.buffer:
-            return
+    def drain(self) -> str | None:
+        if not self._pending:
+            return None
         remaining = self.buffer
-        self.buffer = ""
-        if self.next_nodes:
-            for next_node in self.next_nodes:
-                await next_node.handle(remaining)
+        self._pending = []
+        return remaining
@@ -0,0 +1,223 @@
+"""
+Stream graph executor
+
+StreamNode.handle 深度优先地直接 await 下游节点：下游慢（如 TTS）时上游的分句、LLM 增量消费都被阻塞，各分支串行执行。
+StreamGraph 沿用 connect_to 建立的连接，提供两种执行方式：
+
+- concurrent=False: 与 StreamNode.handle 相同（深度优先、逐层 await）
+- concurrent=True: 每个节点一个任务和一个有界输入队列，节点按顺序处理自己的输入，
+  输出并发地放入各下游节点的队列；下游队列满时上游等待（背压）
+
+两种方式都支持控制消息（见 absctract_stream_node.py）：
+- END_OF_STREAM / flush(): 沿连接传播，各节点在处理完之前的输入后输出缓冲的内容；
+  有多个上游的节点等所有上游都结束后才处理
+- INTERRUPT / interrupt(): 立即丢弃所有节点的缓冲和排队中的数据，取消正在执行的处理，
+  因队列已满或等待 flush 完成而阻塞的调用方随即返回
+
+enable_metrics() 开启各节点的统计（见 node_metrics.py），snapshot() 获取，log_interval > 0 时定期打印一行摘要。
+"""
+from typing import Any, Optional
+
+import asyncio
+import time
+
+from .absctract_stream_node import StreamNode, END_OF_STREAM, INTERRUPT
+
+class StreamGraph:
+    """
+    Args:
+        root (StreamNode): Entry node, the graph is every node reachable through `next_nodes`.
+        concurrent (bool): Run every node as its own task with a bounded inbox.
+        queue_size (int): Capacity of each node's inbox in concurrent mode.
+    """
+    def __init__(self, root: StreamNode, concurrent: bool = True, queue_size: int = 32):
+        self.root = root
+        self.concurrent = concurrent
+        self.queue_size = queue_size
+        self.nodes = self._topological_order(root)
+
+        # 队列元素：(data, 入队时间)
+        self._inboxes: dict[StreamNode, asyncio.Queue] = {}
+        self._tasks: list[asyncio.Task] = []
+        # interrupt() 时完成，让阻塞中的 handle / flush 返回；每次 _start 新建
+        self._interrupted: Optional[asyncio.Future] = None
+
+        self.log_interval = 0.0
+        self._log_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _topological_order(root: StreamNode) -> list[StreamNode]:
+        order: list[StreamNode] = []
+        visited: set[int] = set()
+
+        def visit(node: StreamNode):
+            if id(node) in visited:
+                return
+            visited.add(id(node))
+            for next_node in node.next_nodes:
+                visit(next_node)
+            order.append(node)
+
+        visit(root)
+        order.reverse()
+        return order
+
+    def _start(self):
+        if self._tasks:
+            return
+        self._inboxes = {node: asyncio.Queue(maxsize=self.queue_size) for node in self.nodes}
+        self._tasks = [asyncio.create_task(self._run_node(node)) for node in self.nodes]
+        self._interrupted = asyncio.get_running_loop().create_future()
+
+    async def _until_interrupted(self, awaitable) -> bool:
+        """
+        Wait for `awaitable`, giving up when the graph is interrupted.
+
+        Returns:
+            bool: False if interrupted.
+        """
+        interrupted = self._interrupted
+        task = asyncio.ensure_future(awaitable)
+        try:
+            await asyncio.wait((task, interrupted), return_when=asyncio.FIRST_COMPLETED)  # type: ignore[arg-type]
+        finally:
+            if not task.done():
+                task.cancel()
+        if task.cancelled() or not task.done():
+            return False
+        task.result()
+        return True
+
+    async def _deliver(self, node: StreamNode, data: Any):
+        """与 StreamNode.handle 相同：extract 时列表按元素逐个处理"""
+        if node.extract and type(data) is list:
+            for d in data:
+                await self._deliver(node, d)
+        else:
+            await self._inboxes[node].put((data, time.perf_counter()))
+
+    async def _emit(self, node: StreamNode, result: Any):
+        if len(node.next_nodes) == 1:
+            await self._deliver(node.next_nodes[0], result)
+        elif node.next_nodes:
+            await asyncio.gather(*(self._deliver(next_node, result) for next_node in node.next_nodes))
+
+    async def _run_node(self, node: StreamNode):
+        inbox = self._inboxes[node]
+        while True:
+            data, enqueued = await inbox.get()
+            if node.metrics is not None:
+                node.metrics.record_queue_wait(time.perf_counter() - enqueued)
+            try:
+                if data is END_OF_STREAM:
+                    if not node._end_of_stream_complete():
+                        continue
+                    remaining = node._drain()
+                    if remaining is not None:
+                        await self._emit(node, remaining)
+                    await node.on_end_of_stream()
+                    for next_node in node.next_nodes:
+                        await self._inboxes[next_node].put((END_OF_STREAM, time.perf_counter()))
+                else:
+                    await self._emit(node, await node._process(data))
+            except Exception as e:
+                print(f"[Error] 节点 {node.name} 处理出错: {e}")
+            finally:
+                inbox.task_done()
+
+    async def handle(self, data: Any):
+        """
+        Feed data (or a control message) into the root node.
+        In concurrent mode this returns once the data is queued (waits only when the root's inbox is full).
+        """
+        if data is INTERRUPT:
+            self.interrupt()
+            return
+        self._start_log()
+        if not self.concurrent:
+            await self.root.handle(data)
+            return
+        self._start()
+        inbox = self._inboxes[self.root]
+        if not (self.root.extract and type(data) is list) and not inbox.full():
+            inbox.put_nowait((data, time.perf_counter()))
+        else:
+            await self._until_interrupted(self._deliver(self.root, data))
+
+    async def flush(self):
+        """
+        End the stream: every node emits its buffered output, returns after every node has processed it
+        """
+        if not self.concurrent:
+            await self.root.flush()
+            return
+
+        self._start()
+        root_inbox = self._inboxes[self.root]
+        inboxes = [self._inboxes[node] for node in self.nodes]
+
+        async def end_and_join():
+            await root_inbox.put((END_OF_STREAM, time.perf_counter()))
+            for inbox in inboxes:
+                await inbox.join()
+
+        await self._until_interrupted(end_and_join())
+
+    def interrupt(self):
+        """
+        Drop queued data and the buffered state of every node at once, cancelling the processing in progress.
+        Callers blocked in `handle` / `flush` return without waiting further.
+        """
+        self._stop()
+        self.root.interrupt()
+
+    def _stop(self) -> list[asyncio.Task]:
+        """取消各节点的任务，返回被取消的任务"""
+        if self._interrupted is not None and not self._interrupted.done():
+            self._interrupted.set_result(None)
+        tasks = self._tasks
+        for task in tasks:
+            task.cancel()
+        self._tasks = []
+        self._inboxes = {}
+        return tasks
+
+    async def close(self):
+        """
+        Stop the node tasks and the metrics log, waiting for them to finish
+        """
+        tasks = self._stop()
+        if self._log_task is not None:
+            self._log_task.cancel()
+            tasks.append(self._log_task)
+            self._log_task = None
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def enable_metrics(self, log_interval: float = 0.0):
+        """
+        Args:
+            log_interval (float): Print a summary line every `log_interval` seconds while data flows, 0 to disable.
+        """
+        for node in self.nodes:
+            node.enable_metrics()
+        self.log_interval = log_interval
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        """Metrics of every node in topological order"""
+        return [node.metrics.snapshot() for node in self.nodes if node.metrics is not None]
+
+    def format_metrics(self) -> str:
+        return " | ".join(node.metrics.format() for node in self.nodes if node.metrics is not None)
+
+    def _start_log(self):
+        if self.log_interval > 0 and self._log_task is None:
+            self._log_task = asyncio.create_task(self._log_loop())
+
+    async def _log_loop(self):
+        last_items = -1
+        while True:
+            await asyncio.sleep(self.log_interval)
+            items = sum(node.metrics.items_in for node in self.nodes if node.metrics is not None)
+            if items != last_items: # 没有新数据时不重复打印
+                last_items = items
+                print(f"[Metrics] {self.format_metrics()}", flush=True)
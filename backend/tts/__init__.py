@@ -1,7 +1,8 @@
 from .abstract_tts import AbstractTTS
 from .genie import GenieTTS
 from .dashscope import DashscopeTTS
-from typing import Literal
+from .cached_tts import CachedTTS
+from typing import Literal, Optional
 
 REGISTRY = {
     "genie": GenieTTS,
@@ -10,7 +11,13 @@ REGISTRY = {
 
 Available_TTS_Methods = Literal["genie", "dashscope"]
 
-def create_tts(tts_method_name: Available_TTS_Methods, **kwargs) -> AbstractTTS:
+def create_tts(tts_method_name: Available_TTS_Methods, cache_max_bytes: int = 0, cache_dir: Optional[str] = None, **kwargs) -> AbstractTTS:
+    """
+    Create a TTS by name. The result is wrapped in CachedTTS if cache_max_bytes or cache_dir is set.
+    """
     if tts_method_name not in REGISTRY:
         raise ValueError(f"TTS {tts_method_name} not found in registry")
-    return REGISTRY[tts_method_name](**kwargs)
+    tts = REGISTRY[tts_method_name](**kwargs)
+    if cache_max_bytes or cache_dir:
+        return CachedTTS(tts, max_bytes=cache_max_bytes, cache_dir=cache_dir)
+    return tts
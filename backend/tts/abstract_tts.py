@@ -6,15 +6,48 @@ Format = TypeVar('Format', bound=Literal['wav', 'mp3', 'pcm'])
 class AbstractTTS(ABC):
     """
     Abstract class for TTS service.
+
+    `format` is the format of `synthesize` results, `stream_format` (defaults to `format`) the format of
+    the chunks yielded by `synthesize_stream`. sample_rate / channels / bits_per_sample describe PCM audio.
     """
-    def __init__(self, format: Format, **kwargs):
+    def __init__(self, format: Format, stream_format: Format | None = None, **kwargs):
         self.format = format
+        self.stream_format = stream_format or format
 
-        if self.format == "pcm":
+        if "pcm" in (self.format, self.stream_format):
             self.sample_rate = kwargs.get("sample_rate", 24000)
             self.channels = kwargs.get("channels", 1)
             self.bits_per_sample = kwargs.get("bits_per_sample", 16)
 
+    def cache_identity(self) -> dict:
+        """
+        Everything besides the text that determines the synthesized audio, used as part of the cache key.
+        Subclasses should add their voice / speaker / model.
+        """
+        identity = {"backend": type(self).__name__, "format": self.format}
+        if self.stream_format != self.format:
+            identity["stream_format"] = self.stream_format
+        return identity
+
+    async def synthesize_many(self, texts: list[str]) -> list[bytes]:
+        """
+        Synthesize several texts at once, results are in the same order as `texts`.
+        Subclasses may override this with a higher-throughput implementation.
+        """
+        return [await self.synthesize(text) for text in texts]
+
+    async def warm_up(self):
+        """
+        Prepare connections / models ahead of the first synthesis. Optional.
+        """
+        pass
+
+    async def shutdown(self):
+        """
+        Release connections / worker processes. Optional.
+        """
+        pass
+
     @abstractmethod
     async def synthesize(self, text: str) -> bytes:
         """
@@ -0,0 +1,165 @@
+"""
+Audio post-processing helpers (16 bit PCM)
+
+- wav_info: 解析 WAV 数据的 data chunk 偏移和时长
+- find_audio_end: 从尾部向前分块扫描，只访问句尾的静音部分
+- TailSilenceNormalizer: 流式地把句尾静音统一为固定长度，只暂存（不拼接）尾部的静音片段
+- PCMBuffer: 预分配的输出缓冲区，前面预留 WAV 头，音频块直接写入，结束时就地写入头部，
+  通过 memoryview 返回，不做拼接和额外拷贝
+"""
+from typing import Union
+
+import struct
+
+import numpy as np
+
+WAV_HEADER_SIZE = 44
+SILENCE_THRESHOLD = 10 # 绝对值不大于此值的样本视为静音
+SCAN_BLOCK_SAMPLES = 4096
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+def wav_header(data_size: int, sample_rate: int = 24000, channels: int = 1, bits_per_sample: int = 16) -> bytes:
+    """
+    44 字节的 PCM WAV 文件头
+    """
+    byte_rate = sample_rate * channels * (bits_per_sample // 8)
+    block_align = channels * (bits_per_sample // 8)
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF',                     # 文件标识
+        36 + data_size,              # 文件总长度减去8字节
+        b'WAVE',                     # 格式标识
+        b'fmt ',                     # 子块标识
+        16,                          # 子块大小
+        1,                           # 音频格式（1表示PCM）
+        channels,                    # 声道数
+        sample_rate,                 # 采样率
+        byte_rate,                   # 字节率
+        block_align,                 # 块对齐
+        bits_per_sample,             # 位深度
+        b'data',                     # 数据标识
+        data_size                    # 数据长度
+    )
+
+def wav_info(wav_data: bytes) -> tuple[int, float]:
+    """
+    解析 WAV 数据
+
+    Returns:
+        tuple[int, float]: (data chunk 的字节偏移, 时长秒数)；无法解析时返回 (0, 0.0)
+    """
+    if len(wav_data) < 12 or wav_data[:4] != b"RIFF" or wav_data[8:12] != b"WAVE":
+        return 0, 0.0
+
+    byte_rate = 0
+    pos = 12
+    while pos + 8 <= len(wav_data):
+        chunk_id = wav_data[pos:pos + 4]
+        (chunk_size,) = struct.unpack_from("<I", wav_data, pos + 4)
+        if chunk_id == b"fmt " and pos + 20 <= len(wav_data):
+            (byte_rate,) = struct.unpack_from("<I", wav_data, pos + 16)
+        elif chunk_id == b"data":
+            data_size = min(chunk_size, len(wav_data) - pos - 8)
+            return pos + 8, data_size / byte_rate if byte_rate else 0.0
+        pos += 8 + chunk_size + (chunk_size & 1)
+    return 0, 0.0
+
+def find_audio_end(samples: np.ndarray, threshold: int = SILENCE_THRESHOLD, block_samples: int = SCAN_BLOCK_SAMPLES) -> int:
+    """
+    Index after the last non-silent sample (0 if all samples are silent).
+
+    Scans backwards block by block, so only the silent tail (plus one block) is touched.
+    """
+    end = len(samples)
+    if end and not -threshold <= samples[-1] <= threshold:
+        return end # 常见情况：块尾仍有声音，不需要扫描
+    while end > 0:
+        start = max(0, end - block_samples)
+        block = samples[start:end]
+        loud = np.flatnonzero((block > threshold) | (block < -threshold))
+        if len(loud):
+            return start + int(loud[-1]) + 1
+        end = start
+    return 0
+
+class TailSilenceNormalizer:
+    """
+    Normalize the trailing silence of a PCM stream to a fixed length, chunk by chunk.
+
+    Only the (possibly) silent tail is held back: every chunk is emitted up to its last
+    non-silent sample, the quiet samples after it are released once louder audio follows.
+    """
+    def __init__(self, sample_rate: int, target_silence_ms: int = 200):
+        self.target_samples = int(sample_rate * target_silence_ms / 1000)
+        self.pending: list[np.ndarray] = [] # 暂存的尾部静音
+
+    def feed(self, audio_chunk: np.ndarray) -> list[np.ndarray]:
+        """返回可以立即输出的音频片段"""
+        audio_end = find_audio_end(audio_chunk)
+        if audio_end == 0:
+            self.pending.append(audio_chunk)
+            return []
+
+        output = [*self.pending, audio_chunk[:audio_end]]
+        self.pending = [audio_chunk[audio_end:]]
+        return output
+
+    def finish(self) -> tuple[list[np.ndarray], int]:
+        """
+        Returns:
+            tuple[list[np.ndarray], int]: (保留的尾部静音片段, 需要补充的静音样本数)
+        """
+        output = []
+        remaining = self.target_samples
+        for chunk in self.pending:
+            if remaining <= 0:
+                break
+            output.append(chunk[:remaining])
+            remaining -= len(output[-1])
+        self.pending = []
+        return output, remaining
+
+class PCMBuffer:
+    """
+    Growable PCM buffer with room for a WAV header in front.
+
+    Args:
+        capacity (int): Initial capacity in bytes (excluding the header).
+    """
+    def __init__(self, capacity: int = 0, sample_rate: int = 24000, channels: int = 1, bits_per_sample: int = 16):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bits_per_sample = bits_per_sample
+        self._buffer = bytearray(WAV_HEADER_SIZE + capacity)
+        self._size = 0 # 已写入的 PCM 字节数
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, size: int):
+        required = WAV_HEADER_SIZE + self._size + size
+        if required > len(self._buffer):
+            # 按倍数扩容，均摊后每字节只拷贝常数次
+            self._buffer.extend(bytes(max(required, 2 * len(self._buffer)) - len(self._buffer)))
+
+    def write(self, pcm_data: Union[BytesLike, np.ndarray]):
+        data = memoryview(pcm_data).cast("B")
+        self._reserve(len(data))
+        start = WAV_HEADER_SIZE + self._size
+        self._buffer[start:start + len(data)] = data
+        self._size += len(data)
+
+    def write_silence(self, num_bytes: int):
+        # 只追加写入，未写入的部分都是 0，直接前移即可
+        self._reserve(num_bytes)
+        self._size += num_bytes
+
+    def pcm(self) -> memoryview:
+        return memoryview(self._buffer)[WAV_HEADER_SIZE:WAV_HEADER_SIZE + self._size]
+
+    def to_wav(self) -> bytearray:
+        """写入 WAV 头并截掉多余容量，返回底层缓冲区本身（之后不能再写入）"""
+        self._buffer[:WAV_HEADER_SIZE] = wav_header(self._size, self.sample_rate, self.channels, self.bits_per_sample)
+        del self._buffer[WAV_HEADER_SIZE + self._size:]
+        return self._buffer
@@ -0,0 +1,199 @@
+"""
+Cached TTS: content-addressed cache wrapping any AbstractTTS
+
+缓存键为 (后端, 音色/说话人, 模型, 音频格式, 规范化后的文本) 的哈希。
+WAV 格式的后端整句结果是 WAV 文件，流式合成的块（stream_format）不能直接拼接成整句结果，
+因此流式结果与整句结果分开缓存；PCM 格式的块可以直接拼接，两种方式共用缓存。
+内存中为按字节数限制大小的 LRU，可选磁盘缓存（进程重启后仍可命中）。
+
+磁盘缓存文件 <cache_dir>/<key>.chunks 的结构为若干个 [uint32 BE 长度][音频块]，
+保留音频块的边界，以便 synthesize_stream 命中时按原来的分块回放。
+"""
+from typing import Optional, AsyncGenerator, Any
+from collections import OrderedDict
+
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import re
+import struct
+
+from .abstract_tts import AbstractTTS
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """去除首尾空白并合并连续空白"""
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+class CachedTTS(AbstractTTS):
+    """
+    Wrap a TTS, reusing the audio of previously synthesized text.
+
+    Args:
+        tts (AbstractTTS): The TTS to wrap.
+        max_bytes (int): Byte budget of the in-memory LRU.
+        cache_dir (str | None): Directory of the on-disk cache, disabled if None.
+    """
+    def __init__(self, tts: AbstractTTS, max_bytes: int = 64 * 1024 * 1024, cache_dir: Optional[str] = None):
+        self.tts = tts
+        self.format = tts.format
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self._identity = json.dumps(tts.cache_identity(), ensure_ascii=False, sort_keys=True)
+        self._entries: OrderedDict[str, list[bytes]] = OrderedDict()
+
+        # metrics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0 # 内存中缓存的音频字节数
+
+    def __getattr__(self, name: str) -> Any:
+        # sample_rate / channels / bits_per_sample 等属性沿用被包装的 TTS
+        return getattr(self.tts, name)
+
+    async def warm_up(self):
+        await self.tts.warm_up()
+
+    async def shutdown(self):
+        await self.tts.shutdown()
+
+    def cache_key(self, text: str, stream: bool = False) -> str:
+        mode = "stream" if stream and self.format == "wav" else "whole"
+        return hashlib.sha1(f"{self._identity}\n{mode}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    async def synthesize(self, text: str, **kwargs) -> bytes:
+        key = self.cache_key(text)
+        chunks = await self._lookup(key)
+        if chunks is not None:
+            return b"".join(chunks)
+
+        media_data = self.tts.synthesize(text, **kwargs)
+        if inspect.isawaitable(media_data):
+            media_data = await media_data
+        await self._store(key, [media_data])
+        return media_data
+
+    async def synthesize_many(self, texts: list[str]) -> list[bytes]:
+        keys = [self.cache_key(text) for text in texts]
+        results: dict[str, bytes] = {}
+        missing: dict[str, str] = {} # key -> text
+
+        for key, text in zip(keys, texts):
+            if key in results or key in missing:
+                continue
+            chunks = await self._lookup(key)
+            if chunks is not None:
+                results[key] = b"".join(chunks)
+            else:
+                missing[key] = text
+
+        if missing:
+            for key, media_data in zip(missing, await self.tts.synthesize_many(list(missing.values()))):
+                await self._store(key, [media_data])
+                results[key] = media_data
+
+        return [results[key] for key in keys]
+
+    async def synthesize_stream(self, text: str, **kwargs) -> AsyncGenerator[bytes, None]:
+        key = self.cache_key(text, stream=True)
+        chunks = await self._lookup(key)
+        if chunks is not None:
+            for chunk in chunks:
+                yield chunk
+            return
+
+        # 完整合成后才写入缓存，中途取消或出错的结果不缓存
+        chunks = []
+        async for chunk in self.tts.synthesize_stream(text, **kwargs):  # type: ignore[attr-defined]
+            chunks.append(chunk)
+            yield chunk
+        await self._store(key, chunks)
+
+    async def _lookup(self, key: str) -> Optional[list[bytes]]:
+        chunks = self._entries.get(key)
+        if chunks is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return chunks
+
+        if self.cache_dir:
+            chunks = await asyncio.to_thread(self._read_disk, key)
+            if chunks is not None:
+                self.disk_hits += 1
+                self._put(key, chunks)
+                return chunks
+
+        self.misses += 1
+        return None
+
+    async def _store(self, key: str, chunks: list[bytes]):
+        if not any(chunks):
+            return
+        self._put(key, chunks)
+        if self.cache_dir:
+            await asyncio.to_thread(self._write_disk, key, chunks)
+
+    def _put(self, key: str, chunks: list[bytes]):
+        size = sum(len(chunk) for chunk in chunks)
+        if size > self.max_bytes:
+            return
+
+        old_chunks = self._entries.pop(key, None)
+        if old_chunks is not None:
+            self.bytes -= sum(len(chunk) for chunk in old_chunks)
+        self._entries[key] = chunks
+        self.bytes += size
+
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= sum(len(chunk) for chunk in evicted)
+            self.evictions += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.chunks")  # type: ignore[arg-type]
+
+    def _read_disk(self, key: str) -> Optional[list[bytes]]:
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+
+        chunks = []
+        pos = 0
+        while pos + 4 <= len(data):
+            (size,) = struct.unpack_from(">I", data, pos)
+            chunks.append(data[pos + 4:pos + 4 + size])
+            pos += 4 + size
+        return chunks
+
+    def _write_disk(self, key: str, chunks: list[bytes]):
+        # 先写临时文件再改名，避免读到写了一半的文件
+        path = self._disk_path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(struct.pack(">I", len(chunk)))
+                f.write(chunk)
+        os.replace(tmp_path, path)
+
+    def snapshot(self) -> dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,323 @@
+"""
+Warm realtime session pool for Dashscope TTS
+
+每个 QwenTtsRealtime 会话都要经过 WebSocket + TLS 握手和 update_session，
+池中为每个 (model, voice) 保持若干个已连接、已配置好的会话，在句子之间复用，
+把握手开销移出每句话的关键路径。
+
+会话使用 commit 模式：每句话 append_text + commit，收到 response.done 即为该句结束，
+会话保持打开，可以继续合成下一句。
+增量合成时会话切换到 server_commit 模式，直到 session.finished 才结束，之后不再复用。
+
+服务端会关闭空闲的连接，后台任务每隔 check_interval 秒把即将超过 idle_timeout 的空闲会话换成新建的会话，
+对话停顿之后第一句话仍然能拿到预热好的会话。
+"""
+from typing import Optional, List
+from collections import deque
+
+import asyncio
+import base64
+import time
+
+from dashscope.audio.qwen_tts_realtime import QwenTtsRealtime, QwenTtsRealtimeCallback, AudioFormat
+
+URL = "wss://dashscope.aliyuncs.com/api-ws/v1/realtime"
+
+class SynthesisState:
+    """
+    State of one synthesis call.
+
+    The SDK callback thread hands audio chunks over to the event loop with `call_soon_threadsafe`,
+    the async generator awaits `audio_queue` directly (no blocking, no polling). None marks the end.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.audio_queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+        self.completed = False
+        self.error_message: List[str] = []
+
+    def _put(self, item: Optional[bytes]):
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.audio_queue.put_nowait, item)
+
+    def put(self, audio_data: bytes):
+        self._put(audio_data)
+
+    def finish(self):
+        if self.completed:
+            return
+        self.completed = True
+        self._put(None)
+
+    def fail(self, message: str):
+        self.error_message.append(message)
+        self.finish()
+
+class RealtimeSession(QwenTtsRealtimeCallback):
+    """
+    A connected and configured realtime session. Events are routed to the state of the current call.
+    """
+    def __init__(self, model: str, voice: str, url: str = URL):
+        self.model = model
+        self.voice = voice
+        self.state: Optional[SynthesisState] = None
+        self.mode = 'commit'
+        self.closed = False
+        self.broken = False # 出错或有未完成的响应，不能再复用
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+        self.realtime = QwenTtsRealtime(model=model, callback=self, url=url)
+
+    def open(self):
+        """连接并配置会话（阻塞）"""
+        self.realtime.connect()
+        self.set_mode(self.mode)
+
+    def set_mode(self, mode: str):
+        """配置会话模式: 'commit' 或 'server_commit'（阻塞）"""
+        self.mode = mode
+        self.realtime.update_session(
+            voice=self.voice,
+            response_format=AudioFormat.PCM_24000HZ_MONO_16BIT,
+            mode=mode
+        )
+
+    def close(self):
+        """关闭会话（阻塞）"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.realtime.close()
+        except Exception as e:
+            print(f'[Warning] 关闭 TTS 会话出错: {e}')
+
+    def is_healthy(self, idle_timeout: float) -> bool:
+        return not self.closed and not self.broken and time.monotonic() - self.last_used < idle_timeout
+
+    def on_open(self) -> None:
+        print('[TTS] 连接已建立')
+
+    def on_close(self, close_status_code, close_msg) -> None:
+        print(f'[TTS] 连接关闭 code={close_status_code}, msg={close_msg}')
+        self.closed = True
+        if self.state:
+            if close_status_code != 1000:  # 非正常关闭
+                self.state.fail(f"连接关闭: code={close_status_code}, msg={close_msg}")
+            else:
+                self.state.finish()
+
+    def on_event(self, response: dict) -> None:
+        state = self.state
+        try:
+            event_type = response.get('type', '')
+            if event_type == 'session.created':
+                print(f'[TTS] 会话开始: {response["session"]["id"]}')
+            elif event_type == 'response.audio.delta':
+                if state:
+                    state.put(base64.b64decode(response['delta']))
+            elif event_type == 'response.done':
+                # server_commit 模式下一段文本会产生多个响应，以 session.finished 为结束
+                if state and self.mode == 'commit':
+                    state.finish()
+            elif event_type == 'session.finished':
+                print('[TTS] 会话结束')
+                self.closed = True
+                if state:
+                    state.finish()
+            elif event_type == 'error':
+                self.broken = True
+                if state:
+                    state.fail(str(response.get('error', response)))
+        except Exception as e:
+            print(f'[Error] 处理回调事件异常: {e}')
+            self.broken = True
+            if state:
+                state.fail(str(e))
+
+class SessionPool:
+    """
+    Keep up to `size` sessions (idle + in use) for one (model, voice).
+
+    Args:
+        size (int): Number of sessions to keep, warm idle sessions are refilled up to this count.
+        idle_timeout (float): Sessions idle for longer than this (seconds) are recycled,
+            the server closes idle connections on its own.
+        max_uses (int): Sessions are recycled after this many sentences.
+        check_interval (float): Interval (seconds) of the background refresh of idle sessions.
+    """
+    def __init__(self, model: str, voice: str, size: int = 2, idle_timeout: float = 50, max_uses: int = 500,
+                 check_interval: float = 5):
+        self.model = model
+        self.voice = voice
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_uses = max_uses
+        self.check_interval = check_interval
+
+        self._idle: deque[RealtimeSession] = deque()
+        self._opening = 0
+        self._in_use = 0
+        self._tasks: set[asyncio.Task] = set()
+        self._maintain_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        # metrics
+        self.opened = 0
+        self.reused = 0
+        self.recycled = 0
+        self.refreshed = 0
+
+    def _new_session(self) -> RealtimeSession:
+        session = RealtimeSession(self.model, self.voice)
+        session.open()
+        self.opened += 1
+        return session
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _close(self, session: RealtimeSession):
+        self.recycled += 1
+        await asyncio.to_thread(session.close)
+
+    async def _open_session(self) -> RealtimeSession:
+        """
+        Open a session in a thread, the caller has counted it in `_opening`.
+        If the caller is cancelled, the session still being opened is put into the pool (or closed) once ready.
+        """
+        task = asyncio.ensure_future(asyncio.to_thread(self._new_session))
+        try:
+            session = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            task.add_done_callback(self._adopt)
+            raise
+        except Exception:
+            self._opening -= 1
+            raise
+        self._opening -= 1
+        return session
+
+    def _adopt(self, task: asyncio.Future):
+        """调用方已被取消：建立好的会话归入空闲队列"""
+        self._opening -= 1
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._add_idle(task.result())
+
+    def _add_idle(self, session: RealtimeSession):
+        if not self._closed and self._total() < self.size:
+            self._idle.append(session)
+        else:
+            self._spawn(self._close(session))
+
+    async def _warm_one(self):
+        try:
+            session = await self._open_session()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f'[Warning] 预热 TTS 会话失败: {e}')
+            return
+        self._add_idle(session)
+
+    def _total(self) -> int:
+        return len(self._idle) + self._opening + self._in_use
+
+    def refill(self):
+        """在后台补足会话（空闲 + 使用中 + 正在建立的总数不超过 size），并启动定期刷新"""
+        if self._closed:
+            return
+        while self._total() < self.size:
+            self._opening += 1
+            self._spawn(self._warm_one())
+        if self._maintain_task is None:
+            self._maintain_task = asyncio.create_task(self._maintain())
+
+    def _refresh_idle(self):
+        """关闭下次检查前就会超时的空闲会话，由 refill 补上新的会话"""
+        refresh_age = self.idle_timeout - 2 * self.check_interval
+        now = time.monotonic()
+        for session in list(self._idle):
+            if session.is_healthy(self.idle_timeout) and now - session.last_used < refresh_age:
+                continue
+            self._idle.remove(session)
+            self.refreshed += 1
+            self._spawn(self._close(session))
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                self._refresh_idle()
+                self.refill()
+            except Exception as e:
+                print(f'[Warning] 刷新 TTS 会话失败: {e}')
+
+    async def acquire(self) -> RealtimeSession:
+        """取出一个健康的空闲会话，没有时现场建立"""
+        session = None
+        while self._idle:
+            candidate = self._idle.popleft()
+            if candidate.is_healthy(self.idle_timeout):
+                session = candidate
+                self.reused += 1
+                break
+            self._spawn(self._close(candidate))
+
+        if session is None:
+            self._opening += 1
+            session = await self._open_session()
+
+        self._in_use += 1
+        self.refill()
+        return session
+
+    def release(self, session: RealtimeSession):
+        """归还会话；出错、用满或池已满的会话直接关闭"""
+        session.state = None
+        session.uses += 1
+        session.last_used = time.monotonic()
+        self._in_use -= 1
+
+        if session.is_healthy(self.idle_timeout) and session.uses < self.max_uses:
+            self._add_idle(session)
+        else:
+            self._spawn(self._close(session))
+        self.refill()
+
+    async def close_all(self):
+        """关闭所有空闲会话并停止刷新；使用中的会话归还时关闭"""
+        self._closed = True
+        if self._maintain_task is not None:
+            self._maintain_task.cancel()
+            self._maintain_task = None
+        for task in list(self._tasks):
+            task.cancel()
+        while self._idle:
+            await self._close(self._idle.popleft())
+
+    def snapshot(self) -> dict:
+        return {
+            "model": self.model,
+            "voice": self.voice,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "opening": self._opening,
+            "opened": self.opened,
+            "reused": self.reused,
+            "recycled": self.recycled,
+            "refreshed": self.refreshed,
+        }
+
+_POOLS: dict[tuple[str, str], SessionPool] = {}
+
+def get_session_pool(model: str, voice: str, **kwargs) -> SessionPool:
+    """同一 (model, voice) 共用一个会话池，已关闭的池会被替换"""
+    key = (model, voice)
+    if key not in _POOLS or _POOLS[key]._closed:
+        _POOLS[key] = SessionPool(model, voice, **kwargs)
+    return _POOLS[key]
@@ -1,24 +1,90 @@
+from typing import AsyncGenerator
+
+import asyncio
+
 from ..abstract_tts import AbstractTTS
-from .functional_api import define_speaker, get_tts_wav
-from uuid import uuid4 as uuid
+from .worker_pool import GenieWorkerPool
+
+SAMPLE_RATE = 32000
 
 class GenieTTS(AbstractTTS):
-    def __init__(self, onnx_model_dir: str, language: str, ref_audio_path: str, ref_audio_text: str, ref_audio_language: str):
-        super().__init__(format="wav")
-
-        self.speaker_name = str(uuid())
-
-        define_speaker(
-            self.speaker_name,
-            onnx_model_dir,
-            language,
-            ref_audio_path,
-            ref_audio_text,
-            ref_audio_language,
+    """
+    Genie TTS, inference runs in worker processes (see worker_pool.py)
+
+    Args:
+        workers (int): Number of worker processes, each holds its own ONNX sessions.
+        intra_op_threads (int): ONNX intra-op threads per worker, 0 for onnxruntime's default.
+    """
+    def __init__(self, onnx_model_dir: str, language: str, ref_audio_path: str, ref_audio_text: str, ref_audio_language: str,
+                 workers: int = 1, intra_op_threads: int = 0):
+        # 整句结果为 WAV 文件，流式合成直接输出 PCM 块
+        super().__init__(format="wav", stream_format="pcm", sample_rate=SAMPLE_RATE, channels=1, bits_per_sample=16)
+
+        self.onnx_model_dir = onnx_model_dir
+        self.language = language
+        self.ref_audio_path = ref_audio_path
+        self.ref_audio_text = ref_audio_text
+        self.ref_audio_language = ref_audio_language
+
+        self.worker_pool = GenieWorkerPool(
+            {
+                "onnx_model_dir": onnx_model_dir,
+                "language": language,
+                "ref_audio_path": ref_audio_path,
+                "ref_audio_text": ref_audio_text,
+                "ref_audio_language": ref_audio_language,
+            },
+            workers=workers,
+            intra_op_threads=intra_op_threads,
         )
 
-    def synthesize(self, text: str) -> bytes:
-        return get_tts_wav(text, self.speaker_name)
-    
-    def synthesize_stream(self, text: str):
-        raise NotImplementedError('GenieTTS does not support streaming synthesis!')
+    def cache_identity(self) -> dict:
+        # 用模型和参考音频区分说话人
+        return {
+            **super().cache_identity(),
+            "model": self.onnx_model_dir,
+            "language": self.language,
+            "ref_audio_path": self.ref_audio_path,
+            "ref_audio_text": self.ref_audio_text,
+            "ref_audio_language": self.ref_audio_language,
+        }
+
+    async def synthesize(self, text: str) -> bytes:
+        return await self.worker_pool.call("synthesize", text) or b""
+
+    async def synthesize_many(self, texts: list[str]) -> list[bytes]:
+        """
+        Synthesize several sentences, spreading them over the worker processes.
+        Each worker receives its share as one request and synthesizes it sentence by sentence;
+        duplicated sentences are synthesized once.
+
+        NOTE: the exported ONNX models run with batch size 1, there is no batched inference.
+        Sentences only run in parallel across workers, with the default `workers=1` this is sequential.
+        """
+        unique_texts = list(dict.fromkeys(texts))
+        if not unique_texts:
+            return []
+
+        num_groups = min(self.worker_pool.workers, len(unique_texts))
+        groups = [unique_texts[i::num_groups] for i in range(num_groups)]
+
+        async def synthesize_group(group: list[str]) -> list[bytes]:
+            return [wav_data async for wav_data in self.worker_pool.stream("synthesize_sequence", group)]
+
+        results: dict[str, bytes] = {}
+        for group, wavs in zip(groups, await asyncio.gather(*(synthesize_group(group) for group in groups))):
+            results.update(zip(group, wavs))
+        return [results[text] for text in texts]
+
+    async def synthesize_stream(self, text: str) -> AsyncGenerator[bytes, None]:
+        """
+        Yield raw PCM chunks (`stream_format`, 32 kHz mono 16-bit) as Genie produces them
+        """
+        async for pcm_data in self.worker_pool.stream("synthesize_stream", text):
+            yield pcm_data
+
+    def close(self):
+        self.worker_pool.close()
+
+    async def shutdown(self):
+        await asyncio.to_thread(self.close)
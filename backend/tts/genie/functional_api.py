@@ -1,8 +1,7 @@
 import sys
 import os
-import io
-import wave
 import numpy as np
+from typing import AsyncGenerator
 # from .tts import *
 from config_types import TTS_Config
 
@@ -15,6 +14,8 @@ os.environ['HF_ENDPOINT'] = 'https://hf-mirror.com'
 os.environ["GENIE_DATA_DIR"] = os.path.join(curr_dir, "pretrained", "GenieData")
 import genie_tts as genie
 
+from ..audio_process import TailSilenceNormalizer, PCMBuffer
+
 def is_nonsense(text: str):
     """
     Check if the text is nonsense
@@ -39,9 +40,37 @@ def define_speaker(name: str, onnx_model_dir: str, language: str, ref_audio_path
         language=ref_audio_language
     )
 
-async def get_tts_wav(text: str, speaker_name: str) -> bytes:
+SAMPLE_RATE = 32000 # 32kHz
+TARGET_SILENCE_MS = 200 # 目标静音长度（毫秒）
+
+async def get_tts_pcm_stream(text: str, speaker_name: str) -> AsyncGenerator[bytes, None]:
+    """
+    Generate TTS PCM data (16 bit mono, 32kHz) for the given text, speaker name,
+    yielding chunks as Genie produces them
+    """
+    if is_nonsense(text):
+        return
+
+    iterator = genie.tts_async(
+        character_name=speaker_name,
+        text=text,
+        play=False, # 不允许播放
+        split_sentence=False,
+        # save_path=None
+    )
+
+    normalizer = TailSilenceNormalizer(SAMPLE_RATE, TARGET_SILENCE_MS)
+    async for chunk in iterator:
+        output = normalizer.feed(np.frombuffer(chunk, dtype=np.int16))
+        if output:
+            yield b"".join(output)
+    tail, silence_samples = normalizer.finish()
+    yield b"".join(tail) + bytes(silence_samples * 2)
+
+async def get_tts_wav(text: str, speaker_name: str) -> bytes | bytearray:
     """
-    Generate TTS wav data for the given text, speaker name
+    Generate TTS wav data for the given text, speaker name.
+    The audio is returned in the PCMBuffer's own bytearray, without a final copy.
     """
     if is_nonsense(text):
         return b""
@@ -59,7 +88,9 @@ async def get_tts_wav(text: str, speaker_name: str) -> bytes:
     #     wav_data = f.read()
     # return wav_data
 
-    # async (Genie / GPT-SoVITS does not support streaming! This is actually fake streaming.)
+    # 音频块直接写入预分配的缓冲区，最后就地写入 WAV 头
+    buffer = PCMBuffer(capacity=SAMPLE_RATE * 2 * 4, sample_rate=SAMPLE_RATE)
+
     iterator = genie.tts_async(
         character_name=speaker_name,
         text=text,
@@ -68,58 +99,13 @@ async def get_tts_wav(text: str, speaker_name: str) -> bytes:
         # save_path=None
     )
 
-    audio_chunks = []
+    normalizer = TailSilenceNormalizer(SAMPLE_RATE, TARGET_SILENCE_MS)
     async for chunk in iterator:
-        audio_chunk = np.frombuffer(chunk, dtype=np.int16)
-        audio_chunks.append(audio_chunk)
-
-    combined_audio = np.concatenate(audio_chunks)
-
-    sample_rate = 32000 # 32kHz
-    target_silence_ms = 200 # 目标静音长度（毫秒）
-
-    # 保证固定的静音时长
-    if not audio_chunks:
-        target_samples = int(sample_rate * target_silence_ms / 1000)
-        final_audio = np.zeros(target_samples, dtype=np.int16)
-    else:
-        combined_audio = np.concatenate(audio_chunks)
-        
-        # 从后向前找到第一个非零值（简单静音检测）
-        # 找到绝对值大于10的最后一个样本的位置
-        non_silent_indices = np.where(np.abs(combined_audio) > 10)[0]
-        
-        if len(non_silent_indices) == 0:
-            # 整个音频都是静音
-            audio_end = 0
-        else:
-            audio_end = non_silent_indices[-1] + 1  # 最后一个有声音的索引+1
-        
-        # 计算需要添加的静音
-        target_samples = int(sample_rate * target_silence_ms / 1000)
-        current_samples_after_end = len(combined_audio) - audio_end
-        
-        if current_samples_after_end >= target_samples:
-            # 如果已有足够静音，截取到音频结束+目标静音长度
-            final_audio = combined_audio[:audio_end + target_samples]
-        else:
-            # 如果静音不足，添加静音
-            samples_to_add = target_samples - current_samples_after_end
-            silence_to_add = np.zeros(samples_to_add, dtype=np.int16)
-            final_audio = np.concatenate([combined_audio[:audio_end + current_samples_after_end], silence_to_add])
-    
+        for audio_chunk in normalizer.feed(np.frombuffer(chunk, dtype=np.int16)):
+            buffer.write(audio_chunk)
+    tail, silence_samples = normalizer.finish()
+    for audio_chunk in tail:
+        buffer.write(audio_chunk)
+    buffer.write_silence(silence_samples * 2)
 
-    # 2. 创建WAV文件二进制数据
-    # 使用BytesIO作为内存文件
-    wav_bytesio = io.BytesIO()
-    
-    with wave.open(wav_bytesio, 'wb') as wav_file:
-        # 设置WAV参数
-        wav_file.setnchannels(1)  # 单声道
-        wav_file.setsampwidth(2)   # 16位 = 2字节
-        wav_file.setframerate(sample_rate)
-        wav_file.writeframes(final_audio.tobytes())
-
-    wav_bytesio = wav_bytesio.getvalue()
-    
-    return wav_bytesio
+    return buffer.to_wav()
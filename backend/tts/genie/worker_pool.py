@@ -0,0 +1,258 @@
+"""
+Genie worker pool: run Genie inference in dedicated worker processes
+
+genie_tts 的推理状态（当前说话人、播放器会话）是进程内全局的，同一进程内无法并发合成，
+ONNX 推理、numpy 拼接和 WAV 封装也不应占用智能体的事件循环。
+因此每个工作进程各自加载一份模型（独立的 ONNX 会话），主进程只负责收发请求。
+
+请求队列为所有工作进程共享（空闲的进程取下一个请求），结果由一个读取线程
+通过 call_soon_threadsafe 交给事件循环。
+
+调用方放弃（如被打断）时，调用号发送到每个工作进程的取消队列，工作进程在开始请求前和每个结果块之间检查，
+不再合成已放弃的请求。读取线程定期检查工作进程是否存活，意外退出的进程当前处理的调用直接失败，并重新启动该进程。
+
+NOTE: 工作进程以 spawn 方式启动，会重新导入主模块，入口脚本需要有 `if __name__ == "__main__":` 保护。
+"""
+from typing import Any, AsyncGenerator, Optional
+
+import asyncio
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+
+IDLE = -1 # 工作进程空闲时的当前调用号
+LIVENESS_INTERVAL = 0.5 # 检查工作进程是否存活的间隔（秒）
+
+def _limit_intra_op_threads(num_threads: int):
+    """genie_tts 创建 SessionOptions 时不设置线程数，在工作进程中替换其默认值"""
+    import onnxruntime
+
+    session_options_cls = onnxruntime.SessionOptions
+
+    def session_options():
+        options = session_options_cls()
+        options.intra_op_num_threads = num_threads
+        return options
+
+    onnxruntime.SessionOptions = session_options  # type: ignore[misc]
+
+class _CancelledCall(Exception):
+    pass
+
+def _worker_main(index: int, speaker_config: dict, intra_op_threads: int, requests, responses, cancels, current_calls):
+    """
+    Worker process: load the models once, then handle requests until None is received.
+
+    Request: (call_id, method, args); responses: (call_id, "chunk" | "done" | "error", data)
+    The id of the call being handled is kept in `current_calls[index]`, abandoned call ids arrive in `cancels`.
+    """
+    speaker_name = "genie_worker"
+    try:
+        if intra_op_threads:
+            _limit_intra_op_threads(intra_op_threads)
+
+        from . import functional_api
+        functional_api.define_speaker(speaker_name, **speaker_config)
+    except Exception as e:
+        responses.put((None, "error", f"加载 Genie 模型失败: {e!r}"))
+        return
+
+    cancelled: set[int] = set()
+
+    def check_cancelled(call_id: int):
+        try:
+            while True:
+                cancelled.add(cancels.get_nowait())
+        except queue.Empty:
+            pass
+        if call_id in cancelled:
+            raise _CancelledCall()
+
+    loop = asyncio.new_event_loop()
+    while (request := requests.get()) is not None:
+        call_id, method, args = request
+        current_calls[index] = call_id
+        # 请求按提交顺序取出，更早的调用号不会再出现
+        cancelled = {cancelled_id for cancelled_id in cancelled if cancelled_id >= call_id}
+        try:
+            check_cancelled(call_id)
+            if method == "synthesize":
+                wav_data = loop.run_until_complete(functional_api.get_tts_wav(*args, speaker_name))
+                responses.put((call_id, "chunk", wav_data))
+            elif method == "synthesize_sequence":
+                # 一次请求依次合成多句，按顺序逐句返回（省去每句的请求往返，不是批量推理）
+                for text in args[0]:
+                    wav_data = loop.run_until_complete(functional_api.get_tts_wav(text, speaker_name))
+                    responses.put((call_id, "chunk", wav_data))
+                    check_cancelled(call_id)
+            elif method == "synthesize_stream":
+                async def forward_chunks():
+                    async for pcm_data in functional_api.get_tts_pcm_stream(*args, speaker_name):
+                        responses.put((call_id, "chunk", pcm_data))
+                        check_cancelled(call_id)
+                loop.run_until_complete(forward_chunks())
+            else:
+                raise ValueError(f"Unknown method: {method}")
+            responses.put((call_id, "done", None))
+        except _CancelledCall:
+            pass # 调用方已放弃，不需要回复
+        except Exception as e:
+            responses.put((call_id, "error", repr(e)))
+        finally:
+            current_calls[index] = IDLE
+    loop.close()
+
+class GenieWorkerPool:
+    """
+    Args:
+        speaker_config (dict): Arguments of `define_speaker` (except the name).
+        workers (int): Number of worker processes, each holds its own ONNX sessions.
+        intra_op_threads (int): ONNX intra-op threads per worker, 0 for onnxruntime's default.
+        call_timeout (float): Longest wait in seconds for the next result of a call (queueing included), 0 to wait forever.
+    """
+    def __init__(self, speaker_config: dict, workers: int = 1, intra_op_threads: int = 0, call_timeout: float = 120):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._speaker_config = speaker_config
+        self._intra_op_threads = intra_op_threads
+        self.call_timeout = call_timeout
+
+        num_workers = max(1, workers)
+        self._requests = self._ctx.Queue()
+        self._responses = self._ctx.Queue()
+        self._cancels = [self._ctx.Queue() for _ in range(num_workers)]
+        self._current_calls = self._ctx.Array("q", [IDLE] * num_workers, lock=False)
+        self._call_ids = itertools.count()
+        # call_id -> (事件循环, 结果队列)
+        self._calls: dict[int, tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = {}
+        self._failed_workers = 0
+        self._closing = False
+        self.error: Optional[str] = None # 所有工作进程都启动失败时的错误信息
+
+        # metrics
+        self.cancelled_calls = 0
+        self.restarted_workers = 0
+
+        self._processes = [self._start_worker(index) for index in range(num_workers)]
+
+        self._reader = threading.Thread(target=self._read_responses, daemon=True)
+        self._reader.start()
+
+    def _start_worker(self, index: int):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(index, self._speaker_config, self._intra_op_threads,
+                  self._requests, self._responses, self._cancels[index], self._current_calls),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def _check_workers(self):
+        """意外退出的工作进程：其当前调用失败，并重新启动该进程"""
+        if self._closing:
+            return
+        for index, process in enumerate(self._processes):
+            if process.is_alive() or process.exitcode == 0:
+                continue # 加载模型失败的进程正常退出，已在 _read_responses 中处理
+            call_id = self._current_calls[index]
+            self._current_calls[index] = IDLE
+            print(f"[Error] Genie 工作进程 {index} 意外退出 (exitcode={process.exitcode})，重新启动")
+            if call_id != IDLE:
+                self._dispatch(call_id, "error", f"工作进程意外退出 (exitcode={process.exitcode})")
+            self._processes[index] = self._start_worker(index)
+            self.restarted_workers += 1
+
+    def _read_responses(self):
+        last_check = time.monotonic()
+        while True:
+            if time.monotonic() - last_check >= LIVENESS_INTERVAL:
+                self._check_workers()
+                last_check = time.monotonic()
+            try:
+                response = self._responses.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return # 解释器退出时队列已关闭
+            if response is None:
+                return
+            call_id, kind, data = response
+            if call_id is None:
+                print(f"[Error] Genie 工作进程出错: {data}")
+                self._failed_workers += 1
+                if self._failed_workers == len(self._processes):
+                    # 没有可用的工作进程，所有等待中的调用直接失败
+                    self.error = data
+                    for call_id in list(self._calls):
+                        self._dispatch(call_id, "error", data)
+                continue
+            self._dispatch(call_id, kind, data)
+
+    def _dispatch(self, call_id: int, kind: str, data: Any):
+        call = self._calls.get(call_id)
+        if call is None:
+            return # 调用方已放弃（如被打断）
+        loop, queue = call
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (kind, data))
+        except RuntimeError:
+            pass # 事件循环已关闭
+
+    async def stream(self, method: str, *args) -> AsyncGenerator[Any, None]:
+        """
+        Submit a request and yield its results as the worker produces them
+        """
+        if self.error:
+            raise RuntimeError(f"Genie TTS 不可用: {self.error}")
+
+        call_id = next(self._call_ids)
+        results: asyncio.Queue[tuple[str, Any]] = asyncio.Queue()
+        self._calls[call_id] = (asyncio.get_running_loop(), results)
+        finished = False
+        try:
+            self._requests.put((call_id, method, args))
+            while True:
+                try:
+                    kind, data = await asyncio.wait_for(results.get(), self.call_timeout or None)
+                except asyncio.TimeoutError:
+                    raise RuntimeError(f"Genie TTS 合成超时 ({self.call_timeout}s)") from None
+                if kind == "done":
+                    finished = True
+                    return
+                if kind == "error":
+                    finished = True
+                    raise RuntimeError(f"Genie TTS 合成出错: {data}")
+                yield data
+        finally:
+            self._calls.pop(call_id, None)
+            if not finished:
+                self._cancel(call_id)
+
+    def _cancel(self, call_id: int):
+        """通知所有工作进程放弃该调用（不知道由哪个进程处理）"""
+        self.cancelled_calls += 1
+        for cancels in self._cancels:
+            cancels.put(call_id)
+
+    @property
+    def workers(self) -> int:
+        return len(self._processes)
+
+    async def call(self, method: str, *args) -> Optional[Any]:
+        """
+        Submit a request and return its last result
+        """
+        result = None
+        async for result in self.stream(method, *args):
+            pass
+        return result
+
+    def close(self):
+        self._closing = True
+        for _ in self._processes:
+            self._requests.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+        self._responses.put(None)
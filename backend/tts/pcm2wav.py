@@ -1,4 +1,4 @@
-import struct
+from .audio_process import wav_header, wav_info
 
 def pcm2wav(pcm_data: bytes, 
                sample_rate: int = 24000, 
@@ -16,26 +16,55 @@ def pcm2wav(pcm_data: bytes,
     Returns:
         bytes: WAV格式音频数据
     """
-    data_size = len(pcm_data)
-    byte_rate = sample_rate * channels * (bits_per_sample // 8)
-    block_align = channels * (bits_per_sample // 8)
-    
-    # 创建WAV文件头
-    header = struct.pack(
-        '<4sI4s4sIHHIIHH4sI',
-        b'RIFF',                     # 文件标识
-        36 + data_size,              # 文件总长度减去8字节
-        b'WAVE',                     # 格式标识
-        b'fmt ',                     # 子块标识
-        16,                          # 子块大小
-        1,                           # 音频格式（1表示PCM）
-        channels,                    # 声道数
-        sample_rate,                 # 采样率
-        byte_rate,                   # 字节率
-        block_align,                 # 块对齐
-        bits_per_sample,             # 位深度
-        b'data',                     # 数据标识
-        data_size                    # 数据长度
-    )
-    
-    return header + pcm_data
+    return wav_header(len(pcm_data), sample_rate, channels, bits_per_sample) + pcm_data
+
+class WavStreamFramer:
+    """
+    Frame the audio chunks of one utterance for streaming.
+
+    Only the first frame is a complete WAV file ("wav"), carrying the stream parameters in its header;
+    the following frames are raw PCM continuation frames ("pcm") that the frontend appends to the
+    same playback buffer, instead of one WAV header + payload copy per chunk.
+    WAV input chunks are unwrapped the same way, other formats pass through.
+
+    Args:
+        format (str): Format of the input chunks, `tts.format` or `tts.stream_format`.
+    """
+    def __init__(self, format: str = "pcm", sample_rate: int = 24000, channels: int = 1, bits_per_sample: int = 16):
+        self.format = format
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bits_per_sample = bits_per_sample
+        self.started = False
+
+    @classmethod
+    def for_tts(cls, tts, stream: bool = False) -> "WavStreamFramer":
+        """Framer for the results of `tts.synthesize_stream` (stream=True) or `tts.synthesize`"""
+        format = tts.stream_format if stream else tts.format
+        if format == "pcm":
+            return cls("pcm", tts.sample_rate, tts.channels, tts.bits_per_sample)
+        return cls(format)
+
+    def frame(self, media_data: bytes) -> tuple[bytes | memoryview, str]:
+        """
+        Returns:
+            tuple[bytes | memoryview, str]: (帧数据, 帧格式 "wav" / "pcm" / 原格式)
+        """
+        if self.format not in ("pcm", "wav"):
+            return media_data, self.format
+
+        if not self.started:
+            self.started = True
+            if self.format == "pcm":
+                return pcm2wav(media_data, self.sample_rate, self.channels, self.bits_per_sample), "wav"
+            return media_data, "wav"
+
+        if self.format == "wav":
+            # 去掉后续块的 WAV 头，只发送 PCM 数据（零拷贝视图）
+            offset, _ = wav_info(media_data)
+            return memoryview(media_data)[offset:], "pcm"
+        return media_data, "pcm"
+
+    def reset(self):
+        """开始新的一句话"""
+        self.started = False
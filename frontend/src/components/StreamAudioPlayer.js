@@ -17,6 +17,15 @@ export default class StreamAudioPlayer {
     this.maxQueueSeconds = 120;
     this.underrunCount = 0;
     this.outputSampleRate = 0;
+    // 当前句子的流参数，由句首 WAV 帧的头部给出，后续的 PCM 续帧沿用
+    this.streamFormat = { sampleRate: 24000, numChannels: 1, bitsPerSample: 16 };
+    // Opus 解码（WebCodecs），解码是异步的，音频块按到达顺序串行处理；
+    // 解码出的帧在 output 回调中直接入队，只在句末（is_last）flush
+    this.opusDecoder = null;
+    this.opusConfig = '';
+    this.opusSampleRate = 48000;
+    this.opusTimestamp = 0;
+    this.addChain = Promise.resolve();
 
     // 音量计算相关属性
     this.volume = 0; // 当前音量 (0-1)
@@ -141,9 +150,34 @@ export default class StreamAudioPlayer {
   }
 
   /**
-   * 添加 base64 编码的 WAV 音频数据
+   * 浏览器是否支持解码 Opus（WebCodecs AudioDecoder）
    */
-  async addWavData(base64WavData) {
+  static async isOpusSupported() {
+    if (typeof AudioDecoder === 'undefined') {
+      return false;
+    }
+    try {
+      const { supported } = await AudioDecoder.isConfigSupported({ codec: 'opus', sampleRate: 48000, numberOfChannels: 1 });
+      return supported;
+    } catch (error) {
+      return false;
+    }
+  }
+
+  /**
+   * 添加音频数据（base64 字符串，或二进制帧中的 ArrayBuffer）
+   * format 为 'wav' 时是完整的 WAV 文件（句首帧），为 'pcm' 时是沿用上一个 WAV 头参数的 PCM 续帧，
+   * 为 'opus' 时是若干个 Opus 包（见 backend/protocol/audio_codec.py），options 中带有 sampleRate / numChannels，
+   * options.isLast 标记一句话的最后一块（可能没有音频数据），此时等待解码器输出全部音频
+   */
+  addWavData(base64WavData, format = 'wav', options = {}) {
+    // Opus 解码是异步的，串行处理以保证入队顺序
+    const result = this.addChain.then(() => this.addAudioData(base64WavData, format, options));
+    this.addChain = result.catch(() => {});
+    return result;
+  }
+
+  async addAudioData(base64WavData, format = 'wav', options = {}) {
     if (!this.isStreaming) {
       console.warn('Stream not started. Call startStream() first.');
       return -1;
@@ -152,46 +186,45 @@ export default class StreamAudioPlayer {
     try {
       const mediaId = ++this.mediaIdCounter;
       
-      // 解码 base64
-      let binaryString;
-      if (base64WavData.startsWith('data:audio/wav;base64,')) {
-        // 如果包含data URL前缀，移除它
-        const base64Data = base64WavData.split(',')[1];
-        binaryString = atob(base64Data);
+      let wavArrayBuffer;
+      if (base64WavData instanceof ArrayBuffer) {
+        // 二进制帧传输的原始 WAV 数据，无需解码
+        wavArrayBuffer = base64WavData;
       } else {
-        binaryString = atob(base64WavData);
-      }
-      
-      const bytes = new Uint8Array(binaryString.length);
-      for (let i = 0; i < binaryString.length; i++) {
-        bytes[i] = binaryString.charCodeAt(i);
+        // 解码 base64
+        let binaryString;
+        if (base64WavData.startsWith('data:audio/wav;base64,')) {
+          // 如果包含data URL前缀，移除它
+          const base64Data = base64WavData.split(',')[1];
+          binaryString = atob(base64Data);
+        } else {
+          binaryString = atob(base64WavData);
+        }
+        
+        const bytes = new Uint8Array(binaryString.length);
+        for (let i = 0; i < binaryString.length; i++) {
+          bytes[i] = binaryString.charCodeAt(i);
+        }
+        wavArrayBuffer = bytes.buffer;
       }
       
-      // 解析WAV并获取音频数据
-      const audioData = await this.decodeWavData(bytes.buffer);
-      
-      const chunkSamples = audioData.length;
-      const queuedSeconds = this.getRemainingDuration();
-
-      if (queuedSeconds > this.maxQueueSeconds) {
-        console.warn(
-          `Audio queue is too large (${queuedSeconds.toFixed(2)}s). Dropping chunk.`,
-        );
-        return -1;
-      }
-
-      this.totalSamplesScheduled += chunkSamples;
-      const endSample = this.totalSamplesScheduled;
-
-      if (this.workletNode) {
-        this.enqueueChunk(audioData);
-      } else {
-        this.pendingChunks.push(audioData);
+      // 解析WAV / PCM 续帧 / Opus 并获取音频数据
+      if (format === 'opus') {
+        // 解码出的音频由 output 回调入队
+        await this.decodeOpusData(wavArrayBuffer, options.sampleRate, options.numChannels, options.isLast);
+      } else if (wavArrayBuffer.byteLength > 0) {
+        // 句末标记（is_last）可能不带音频数据
+        const audioData = format === 'pcm'
+          ? this.decodePcmData(wavArrayBuffer)
+          : await this.decodeWavData(wavArrayBuffer);
+        if (!this.scheduleAudio(audioData)) {
+          return -1;
+        }
       }
 
       this.mediaMap.set(mediaId, {
         timestamp: Date.now(),
-        endSample,
+        endSample: this.totalSamplesScheduled,
       });
       
       return mediaId;
@@ -201,6 +234,29 @@ export default class StreamAudioPlayer {
     }
   }
 
+  /**
+   * 将解码后的音频加入播放队列，队列过长时丢弃
+   */
+  scheduleAudio(audioData) {
+    const queuedSeconds = this.getRemainingDuration();
+
+    if (queuedSeconds > this.maxQueueSeconds) {
+      console.warn(
+        `Audio queue is too large (${queuedSeconds.toFixed(2)}s). Dropping chunk.`,
+      );
+      return false;
+    }
+
+    this.totalSamplesScheduled += audioData.length;
+
+    if (this.workletNode) {
+      this.enqueueChunk(audioData);
+    } else {
+      this.pendingChunks.push(audioData);
+    }
+    return true;
+  }
+
   async waitUntilFinish(mediaId) {
     const mediaInfo = this.mediaMap.get(mediaId);
     if (!mediaInfo) {
@@ -293,6 +349,7 @@ export default class StreamAudioPlayer {
         
         // 更新通道数
         this.numChannels = numChannels;
+        this.streamFormat = { sampleRate, numChannels, bitsPerSample };
         
         break;
       }
@@ -307,6 +364,74 @@ export default class StreamAudioPlayer {
     return audioData;
   }
 
+  /**
+   * 解码 PCM 续帧（参数沿用最近一个 WAV 头）
+   */
+  decodePcmData(pcmArrayBuffer) {
+    const { sampleRate, numChannels, bitsPerSample } = this.streamFormat;
+    const audioData = this.extractAudioData(
+      new DataView(pcmArrayBuffer),
+      0,
+      pcmArrayBuffer.byteLength,
+      numChannels,
+      bitsPerSample
+    );
+    return this.resampleAudioData(audioData, sampleRate, this.audioContext.sampleRate, numChannels);
+  }
+
+  /**
+   * 解码 Opus 帧: [packet_len: uint16 BE][packet] ...，解码结果由 handleOpusFrame 入队。
+   * 只在句末（isLast）flush 解码器，等待这句话的音频全部输出
+   */
+  async decodeOpusData(opusArrayBuffer, sampleRate = 48000, numChannels = 1, isLast = false) {
+    const config = `${sampleRate}/${numChannels}`;
+    if (!this.opusDecoder || this.opusDecoder.state === 'closed' || this.opusConfig !== config) {
+      if (this.opusDecoder && this.opusDecoder.state !== 'closed') {
+        await this.opusDecoder.flush();
+        this.opusDecoder.close();
+      }
+      this.opusDecoder = new AudioDecoder({
+        output: (frame) => this.handleOpusFrame(frame),
+        error: (error) => console.error('Opus decode error:', error),
+      });
+      this.opusDecoder.configure({ codec: 'opus', sampleRate, numberOfChannels: numChannels });
+      this.opusConfig = config;
+      this.opusSampleRate = sampleRate;
+    }
+
+    const dataView = new DataView(opusArrayBuffer);
+    let offset = 0;
+    while (offset + 2 <= dataView.byteLength) {
+      const packetLen = dataView.getUint16(offset);
+      this.opusDecoder.decode(new EncodedAudioChunk({
+        type: 'key',
+        timestamp: this.opusTimestamp,
+        data: new Uint8Array(opusArrayBuffer, offset + 2, packetLen),
+      }));
+      this.opusTimestamp += 20000; // 每个包 20 ms（微秒）
+      offset += 2 + packetLen;
+    }
+    if (isLast) {
+      await this.opusDecoder.flush();
+    }
+  }
+
+  /**
+   * Opus 解码器的 output 回调：只取第一个声道，入队播放
+   */
+  handleOpusFrame(frame) {
+    try {
+      if (!this.isStreaming || !this.audioContext) {
+        return;
+      }
+      const floatData = new Float32Array(frame.numberOfFrames);
+      frame.copyTo(floatData, { planeIndex: 0, format: 'f32-planar' });
+      this.scheduleAudio(this.resampleAudioData(floatData, this.opusSampleRate, this.audioContext.sampleRate, 1));
+    } finally {
+      frame.close();
+    }
+  }
+
   /**
    * 从WAV文件中提取音频数据
    */
@@ -449,6 +574,10 @@ export default class StreamAudioPlayer {
     this.totalSamplesScheduled = 0;
     this.queueSamples = 0;
     this.pendingChunks = [];
+    if (this.opusDecoder && this.opusDecoder.state !== 'closed') {
+      this.opusDecoder.close();
+    }
+    this.opusDecoder = null;
 
     if (this.workletNode) {
       try {
@@ -1,5 +1,22 @@
+/**
+ * 解析二进制音频帧: [header_len: uint32 BE][header: UTF-8 JSON][media_data]
+ * (格式定义见 backend/protocol/audio_frame.py)
+ */
+function decodeAudioFrame(buffer) {
+    const headerLen = new DataView(buffer).getUint32(0);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLen)));
+    return { ...header, media_data: buffer.slice(4 + headerLen) };
+}
+
 export default class FrontendAgent extends EventTarget {
-    constructor(serverUrl, agentName) {
+    /**
+     * @param {string} serverUrl
+     * @param {string} agentName
+     * @param {Object} [options]
+     * @param {boolean} [options.binaryAudio=true] - 以二进制帧接收音频（media_data 为 ArrayBuffer）
+     * @param {string|null} [options.audioCodec=null] - 音频压缩格式（'opus'），null 为不压缩
+     */
+    constructor(serverUrl, agentName, { binaryAudio = true, audioCodec = null } = {}) {
         super();
 
         // 确保 serverUrl 是合法的 WebSocket 地址
@@ -11,6 +28,8 @@ export default class FrontendAgent extends EventTarget {
 
         this.serverUrl = serverUrl;
         this.agentName = agentName;
+        this.binaryAudio = binaryAudio;
+        this.audioCodec = audioCodec;
         this.ws = null;
         this.reconnectAttempts = 0;
         this.maxReconnectAttempts = 5;
@@ -19,7 +38,12 @@ export default class FrontendAgent extends EventTarget {
 
     connect() {
         try {
-            this.ws = new WebSocket(`${this.serverUrl}/ws/frontend/${this.agentName}`); // 连接到指定的 agent
+            const params = new URLSearchParams();
+            if (this.binaryAudio) params.set('binary', '1');
+            if (this.audioCodec) params.set('codec', this.audioCodec);
+            const query = params.toString() ? `?${params}` : '';
+            this.ws = new WebSocket(`${this.serverUrl}/ws/frontend/${this.agentName}${query}`); // 连接到指定的 agent
+            this.ws.binaryType = 'arraybuffer';
             
             this.ws.onopen = () => {
                 console.log('WebSocket connection opened');
@@ -31,7 +55,9 @@ export default class FrontendAgent extends EventTarget {
 
             this.ws.onmessage = (event) => {
                 try {
-                    const message = JSON.parse(event.data);
+                    const message = event.data instanceof ArrayBuffer
+                        ? { time: null, data: decodeAudioFrame(event.data) }
+                        : JSON.parse(event.data);
 
                     console.log(message);
                     